@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dds.settings')
+# Под ASGI список, запись и выгрузка обслуживаются async-представлениями
+os.environ.setdefault('DDS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'records.metrics.MetricsMiddleware',
+    'records.middleware.PrimaryStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'records.middleware.RequestClockMiddleware',
 ]
 
 ROOT_URLCONF = 'dds.urls'
@@ -77,13 +82,90 @@ WSGI_APPLICATION = 'dds.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Профиль SQLite для продакшена, применяется при открытии каждого соединения:
+# WAL - читатели не блокируются писателем; synchronous=NORMAL в режиме WAL
+# не теряет данные при падении процесса; cache_size < 0 - размер в KiB;
+# busy_timeout - сколько ждать блокировку вместо "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
 }
 
+# База выбирается переменными окружения:
+#   DDS_DB_ENGINE - sqlite (по умолчанию) или postgresql
+#   DDS_DB_NAME - файл SQLite или имя базы PostgreSQL
+#   DDS_DB_USER, DDS_DB_PASSWORD, DDS_DB_HOST, DDS_DB_PORT - подключение к PostgreSQL
+#   DDS_DB_POOL=1 - пул соединений psycopg (DDS_DB_POOL_MIN_SIZE, DDS_DB_POOL_MAX_SIZE)
+#   DDS_DB_CONN_MAX_AGE - время жизни постоянного соединения без пула, с
+#   DDS_DB_REPLICA_HOST (PostgreSQL) или DDS_DB_REPLICA_NAME (SQLite) - реплика для чтения
+DB_ENGINE = os.environ.get('DDS_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.environ.get('DDS_DB_POOL', '').lower() in ('1', 'true', 'yes')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DDS_DB_NAME', 'dds'),
+            'USER': os.environ.get('DDS_DB_USER', 'dds'),
+            'PASSWORD': os.environ.get('DDS_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DDS_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DDS_DB_PORT', '5432'),
+            # С пулом соединения возвращаются в пул после запроса, CONN_MAX_AGE должен быть 0
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DDS_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DDS_DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DDS_DB_POOL_MAX_SIZE', 10)),
+                },
+            } if DB_POOL else {},
+        }
+    }
+    REPLICA_OVERRIDES = {
+        'HOST': os.environ['DDS_DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DDS_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    } if os.environ.get('DDS_DB_REPLICA_HOST') else None
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DDS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DDS_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                # Транзакция сразу берет блокировку записи, поэтому ожидание
+                # busy_timeout работает, а не падает при попытке повысить блокировку
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+    REPLICA_OVERRIDES = {
+        'NAME': os.environ['DDS_DB_REPLICA_NAME'],
+    } if os.environ.get('DDS_DB_REPLICA_NAME') else None
+else:
+    raise ImproperlyConfigured(f"Unsupported DDS_DB_ENGINE: {DB_ENGINE}")
+
+if REPLICA_OVERRIDES:
+    # В тестах реплика смотрит в тестовую базу основного сервера
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        **REPLICA_OVERRIDES,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Чтения записей идут на реплику (если она настроена), запись - на основной сервер.
+# Клиент, только что изменивший данные, RECORDS_PRIMARY_STICKY_SECONDS читает
+# с основного сервера, пока реплика догоняет.
+DATABASE_ROUTERS = ['records.routers.PrimaryReplicaRouter']
+RECORDS_REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+RECORDS_PRIMARY_STICKY_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,3 +212,36 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Records API pagination
+
+RECORDS_PAGE_SIZE = 100
+RECORDS_MAX_PAGE_SIZE = 1000
+RECORDS_BULK_BATCH_SIZE = 500
+RECORDS_EXPORT_CHUNK_SIZE = 2000
+RECORDS_REPORTS_USE_DAILY_TOTALS = True
+# Список записей в админ-панели с фильтрами считает строки не дальше этого порога
+RECORDS_ADMIN_COUNT_LIMIT = 10_000
+# Асинхронные представления списка, записи и выгрузки; включаются в dds/asgi.py
+RECORDS_ASYNC_VIEWS = os.environ.get('DDS_ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+# Потоков для чтения async-выгрузки (records.executor), общих для всех запросов;
+# 0 - чтение в потоке запроса, как sync_to_async в Django по умолчанию
+RECORDS_ASYNC_DB_THREADS = int(os.environ.get('DDS_ASYNC_DB_THREADS', 8))
+
+# Background jobs (records.jobs): очередь в таблице Job, воркер - manage.py run_jobs.
+# Файлы выгрузок и загрузок хранятся в RECORDS_JOBS_DIR
+
+RECORDS_JOBS_DIR = Path(os.environ.get('DDS_JOBS_DIR', BASE_DIR / 'jobs'))
+RECORDS_JOB_PROCESSES = int(os.environ.get('DDS_JOB_PROCESSES', 2))
+
+# Request metrics (records.metrics): warn about slow requests and N+1 query patterns
+
+METRICS_SLOW_REQUEST_MS = 500
+METRICS_MAX_QUERIES = 20
+
+# Records reference data cache (Status/Type/Category/Subcategory)
+# None - снимок справочника хранится в памяти процесса;
+# alias из CACHES (например, file-based) - общий снимок для нескольких воркеров
+
+RECORDS_REFERENCE_CACHE = None
+RECORDS_REFERENCE_CACHE_TIMEOUT = 300
+
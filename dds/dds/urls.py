@@ -14,15 +14,31 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView
 from rest_framework import routers
 
-from records.views import (ReadCreateRecordsAPIView,
+from records.metrics import metrics_view
+from records.views import (ReadCreateRecordsAPIView, BulkRecordsAPIView, ExportRecordsAPIView,
+                           RecordsReportAPIView, RecordChangesAPIView,
                            RetrieveDetailRecordAPIView,
+                           JobsAPIView, ImportJobAPIView, JobDetailAPIView, JobResultAPIView,
+                           ReferenceTreeAPIView, ReferenceChildrenAPIView,
                            TypeViewSet, StatusViewSet,
-                           CategoryViewSet, SubcategoryViewSet)
+                           CategoryViewSet, SubcategoryViewSet,
+                           AsyncRecordsView, AsyncRecordDetailView, AsyncExportRecordsView)
+
+if settings.RECORDS_ASYNC_VIEWS:
+    records_view = csrf_exempt(AsyncRecordsView.as_view())
+    record_detail_view = csrf_exempt(AsyncRecordDetailView.as_view())
+    export_records_view = AsyncExportRecordsView.as_view()
+else:
+    records_view = ReadCreateRecordsAPIView.as_view()
+    record_detail_view = RetrieveDetailRecordAPIView.as_view()
+    export_records_view = ExportRecordsAPIView.as_view()
 
 router = routers.SimpleRouter()
 router.register("type", TypeViewSet)
@@ -32,8 +48,19 @@ router.register("subcategory", SubcategoryViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/v1/records/', ReadCreateRecordsAPIView.as_view()),
-    path('api/v1/records/<int:pk>/', RetrieveDetailRecordAPIView.as_view(), name='records-detail'),
+    path('metrics', metrics_view),
+    path('api/v1/records/', records_view),
+    path('api/v1/records/bulk/', BulkRecordsAPIView.as_view()),
+    path('api/v1/records/export/', export_records_view),
+    path('api/v1/records/changes/', RecordChangesAPIView.as_view()),
+    path('api/v1/reports/', RecordsReportAPIView.as_view()),
+    path('api/v1/records/<int:pk>/', record_detail_view, name='records-detail'),
+    path('api/v1/jobs/', JobsAPIView.as_view()),
+    path('api/v1/jobs/import/', ImportJobAPIView.as_view()),
+    path('api/v1/jobs/<int:pk>/', JobDetailAPIView.as_view(), name='jobs-detail'),
+    path('api/v1/jobs/<int:pk>/result/', JobResultAPIView.as_view(), name='jobs-result'),
+    path('api/v1/tree/', ReferenceTreeAPIView.as_view()),
+    path('api/v1/tree/children/', ReferenceChildrenAPIView.as_view(), name='tree-children'),
     path('api/v1/', include(router.urls)),
 
 ]
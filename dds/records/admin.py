@@ -1,8 +1,61 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import EmptyPage, Paginator
+from django.utils.functional import cached_property
 from rangefilter.filters import DateRangeFilter
 
-from records.forms import RecordForm
+from records.forms import RecordForm, ReferenceAutocompleteSelect
 from records.models import Status, Type, Category, Subcategory, Records
+from records.selectors import attach_dictionary_items, get_reference_data, get_records_count_estimate
+from records.services import save_record, delete_record, bulk_delete_records
+
+
+class RecordsPaginator(Paginator):
+    """
+    Пагинатор списка записей без COUNT(*) по всей таблице
+
+    Строки считаются не дальше RECORDS_ADMIN_COUNT_LIMIT: COUNT по подзапросу
+    с LIMIT останавливается на пороге. Без фильтров показывается оценка
+    get_records_count_estimate, если она больше.
+    Оценка может отставать от таблицы (статистика PostgreSQL до ANALYZE,
+    DailyTotals после изменений в обход сервисов), поэтому страницы режутся
+    и проверяются по самим строкам, а не по count.
+    """
+    @cached_property
+    def count(self):
+        # Не меньше реального числа строк в пределах порога: по count ChangeList
+        # решает, отдавать ли весь список без пагинации
+        count = self.object_list[:settings.RECORDS_ADMIN_COUNT_LIMIT].count()
+        if count >= settings.RECORDS_ADMIN_COUNT_LIMIT and not self.object_list.query.where:
+            count = max(count, get_records_count_estimate())
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Страница за пределами count может быть не пустой; это проверяет page()
+            number = int(number)
+            if number < 1:
+                raise
+            return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = self.object_list[bottom:bottom + self.per_page]
+        if number > 1 and not rows:
+            raise EmptyPage(self.error_messages["no_results"])
+        return self._get_page(rows, number, self)
+
+
+class ReferenceListFilter(admin.RelatedFieldListFilter):
+    """
+    Фильтр по элементу справочника: варианты из закэшированного снимка, без запроса к базе
+    """
+    def field_choices(self, field, request, model_admin):
+        items = get_reference_data().by_id[field.name].values()
+        return sorted(((item.pk, item.title) for item in items), key=lambda choice: choice[1])
 
 
 # Register your models here.
@@ -10,21 +63,27 @@ from records.models import Status, Type, Category, Subcategory, Records
 @admin.register(Status)
 class StatusAdmin(admin.ModelAdmin):
     list_display = ('id', 'title')
+    search_fields = ('title',)
 
 
 @admin.register(Type)
 class TypeAdmin(admin.ModelAdmin):
     list_display = ('id', 'title')
+    search_fields = ('title',)
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'type')
+    list_select_related = ('type',)
+    search_fields = ('title',)
 
 
 @admin.register(Subcategory)
 class SubcategoryAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'category')
+    list_select_related = ('category',)
+    search_fields = ('title',)
 
 
 @admin.register(Records)
@@ -33,6 +92,36 @@ class RecordsAdmin(admin.ModelAdmin):
     list_display = ( 'date', 'status',
                     'type', 'category', 'subcategory',
                     'amount', 'comment')
+    # Названия справочника приходят одним запросом с JOIN, а не запросом на строку
+    list_select_related = ('status', 'type', 'category', 'subcategory')
 
-    list_filter = ('status', 'type', 'category', 'subcategory', ('date', DateRangeFilter))
+    list_filter = (('status', ReferenceListFilter), ('type', ReferenceListFilter),
+                   ('category', ReferenceListFilter), ('subcategory', ReferenceListFilter),
+                   ('date', DateRangeFilter))
     ordering = ('-date',)
+    # Категории и подкатегории - связанные списки (ChainedSelect в RecordForm)
+    autocomplete_fields = ('status', 'type')
+
+    # На больших таблицах точные COUNT(*) дороже самой страницы
+    paginator = RecordsPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_object(self, request, object_id, from_field=None):
+        record = super().get_object(request, object_id, from_field)
+        return attach_dictionary_items(record) if record is not None else None
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.autocomplete_fields:
+            kwargs["widget"] = ReferenceAutocompleteSelect(db_field, self.admin_site, using=kwargs.get("using"))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    # Изменения идут через сервисы, чтобы поддерживать суммы за день (DailyTotals)
+    def save_model(self, request, obj, form, change):
+        save_record(obj)
+
+    def delete_model(self, request, obj):
+        delete_record(obj)
+
+    def delete_queryset(self, request, queryset):
+        bulk_delete_records(queryset)
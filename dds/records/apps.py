@@ -5,3 +5,8 @@ class RecordsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'records'
     verbose_name = "Управление ДДС"
+
+    def ready(self):
+        from records import signals  # noqa: F401
+        # Счетчик SQL-запросов ставится на соединения при создании (см. install_query_counter)
+        from records import metrics  # noqa: F401
@@ -0,0 +1,530 @@
+import asyncio
+import datetime
+import io
+import json
+import logging
+import math
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from records import clock, renderers
+from records.models import Records, Status, Type, Category, Subcategory
+from records.renderers import FastJSONRenderer
+from records.selectors import RECORD_ROW_FIELDS
+from records.serializers import RecordsSerializer, serialize_record_rows
+from records.services import rebuild_daily_totals
+
+
+def seed_ledger(
+        records=1000,
+        statuses=3,
+        types=2,
+        categories_per_type=5,
+        subcategories_per_category=4,
+        days=3 * 365,
+        batch_size=5000,
+        seed=0,
+) -> dict:
+    """
+    Заполняет базу синтетическим справочником и записями операций
+
+    Подкатегории выбираются с весами 1/n, как в реальном учёте, где
+    несколько статей расходов встречаются намного чаще остальных.
+    Даты записей равномерно распределены за последние days дней.
+    После заполнения пересобирается DailyTotals.
+
+    Принимает:
+        records: int - количество записей
+        statuses: int - количество статусов
+        types: int - количество типов операций
+        categories_per_type: int - количество категорий на тип
+        subcategories_per_category: int - количество подкатегорий на категорию
+        days: int - глубина истории в днях
+        batch_size: int - размер пачки bulk_create
+        seed: int - зерно генератора случайных чисел
+
+    Возвращает:
+        dict - созданные элементы справочника по сущностям
+    """
+    rng = random.Random(seed)
+    status_objs = Status.objects.bulk_create(
+        [Status(title=f"Статус {i}") for i in range(statuses)]
+    )
+    type_objs = Type.objects.bulk_create(
+        [Type(title=f"Тип {i}") for i in range(types)]
+    )
+    category_objs = Category.objects.bulk_create([
+        Category(title=f"Категория {t.pk}-{i}", type=t)
+        for t in type_objs for i in range(categories_per_type)
+    ])
+    subcategory_objs = Subcategory.objects.bulk_create([
+        Subcategory(title=f"Подкатегория {c.pk}-{i}", category=c)
+        for c in category_objs for i in range(subcategories_per_category)
+    ])
+    weights = [1 / (rank + 1) for rank in range(len(subcategory_objs))]
+    today = clock.today()
+
+    for start in range(0, records, batch_size):
+        size = min(batch_size, records - start)
+        batch = []
+        for subcategory in rng.choices(subcategory_objs, weights, k=size):
+            category = subcategory.category
+            batch.append(Records(
+                date=today - datetime.timedelta(days=rng.randrange(days)),
+                status=rng.choice(status_objs),
+                type=category.type,
+                category=category,
+                subcategory=subcategory,
+                amount=rng.randint(100, 100_000),
+                comment="",
+            ))
+        Records.objects.bulk_create(batch)
+    rebuild_daily_totals()
+
+    return {
+        "statuses": status_objs,
+        "types": type_objs,
+        "categories": category_objs,
+        "subcategories": subcategory_objs,
+    }
+
+
+def percentile(values, fraction: float) -> float:
+    """
+    Перцентиль по методу ближайшего ранга
+
+    Принимает:
+        values: list[float] - измерения
+        fraction: float - доля от 0 до 1, например 0.95
+
+    Возвращает:
+        float
+    """
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def consume_streaming_content(response) -> int:
+    """
+    Дочитывает потоковый ответ (синхронный или асинхронный)
+
+    Возвращает:
+        int - количество байт
+    """
+    if response.is_async:
+        async def consume():
+            return sum([len(chunk) async for chunk in response.streaming_content])
+        return async_to_sync(consume)()
+    return sum(len(chunk) for chunk in response.streaming_content)
+
+
+def measure_requests(send, repeat: int) -> dict:
+    """
+    Выполняет запрос repeat раз и собирает задержку и число SQL-запросов
+
+    Принимает:
+        send: Callable[[int], HttpResponse] - отправляет запрос с номером повтора
+        repeat: int - количество повторов
+
+    Возвращает:
+        dict - p50_ms, p95_ms, queries (медиана на запрос) и throughput_rps
+    """
+    timings, queries = [], []
+    for i in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = send(i)
+            if response.streaming:
+                consume_streaming_content(response)
+            timings.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.content[:200]!r}")
+        queries.append(len(captured))
+    return {
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "queries": statistics.median(queries),
+        "throughput_rps": round(repeat / sum(timings), 1),
+    }
+
+
+def run_api_benchmark(ledger: dict, repeat=50, client=None) -> dict:
+    """
+    Замеряет основные сценарии API записей через тестовый клиент Django
+
+    Запросы проходят весь стек: middleware, DRF, сериализацию и базу.
+    Сценарии изменения данных (create, update) тоже выполняются, поэтому
+    запускать бенчмарк нужно на отдельной базе.
+
+    Принимает:
+        ledger: dict - результат seed_ledger
+        repeat: int - количество повторов каждого сценария
+        client: Client - тестовый клиент, по умолчанию новый
+
+    Возвращает:
+        dict - результаты measure_requests по названию сценария
+    """
+    client = client or Client()
+    rng = random.Random(0)
+    ids = list(Records.objects.values_list("pk", flat=True)[:1000])
+    subcategory = ledger["subcategories"][0]
+    category = subcategory.category
+    today = clock.today()
+    month_ago = (today - datetime.timedelta(days=30)).isoformat()
+    new_record = {
+        "status": ledger["statuses"][0].title,
+        "type": category.type.title,
+        "category": category.title,
+        "subcategory": subcategory.title,
+        "amount": 1500,
+        "comment": "benchmark",
+    }
+
+    scenarios = {
+        "list": lambda i: client.get("/api/v1/records/"),
+        "filter": lambda i: client.get("/api/v1/records/", {
+            "date_from": month_ago, "category_id": category.pk,
+        }),
+        "detail": lambda i: client.get(f"/api/v1/records/{rng.choice(ids)}/"),
+        "create": lambda i: client.post("/api/v1/records/", new_record, content_type="application/json"),
+        "update": lambda i: client.patch(
+            f"/api/v1/records/{rng.choice(ids)}/", {"amount": 100 + i}, content_type="application/json"),
+        "export": lambda i: client.get("/api/v1/records/export/", {"date_from": month_ago}),
+        "report": lambda i: client.get("/api/v1/reports/", {"period": "month", "group_by": "type"}),
+    }
+    return {name: measure_requests(send, repeat) for name, send in scenarios.items()}
+
+
+def run_serialization_benchmark(rows: list[tuple], repeat=5) -> dict:
+    """
+    Сравнивает скорость сериализации и рендеринга страницы записей
+
+    "drf" - RecordsSerializer(many=True) и штатный JSONRenderer, как было
+    до быстрого пути; "fast" - serialize_record_rows и FastJSONRenderer;
+    "fast_stdlib" - то же без orjson (запасной вариант на чистом Python).
+
+    Принимает:
+        rows: list[tuple] - строки get_records_rows
+        repeat: int - количество повторов каждого варианта
+
+    Возвращает:
+        dict - медианное время в мс и записей в секунду по варианту
+    """
+    def drf():
+        data = RecordsSerializer([dict(zip(RECORD_ROW_FIELDS, row)) for row in rows], many=True).data
+        return JSONRenderer().render({"records": data})
+
+    def fast():
+        return FastJSONRenderer().render({"records": serialize_record_rows(rows)})
+
+    def fast_stdlib():
+        with mock.patch.object(renderers, "orjson", None):
+            return fast()
+
+    results = {}
+    for name, render in (("drf", drf), ("fast", fast), ("fast_stdlib", fast_stdlib)):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        results[name] = {"median_ms": round(median * 1000, 3), "records_per_second": round(len(rows) / median)}
+    return results
+
+
+# Настройки SQLite Django по умолчанию: журнал отката, соединение на запрос
+SQLITE_DEFAULT_PROFILE = {
+    "CONN_MAX_AGE": 0,
+    "CONN_HEALTH_CHECKS": False,
+    "OPTIONS": {"init_command": "PRAGMA journal_mode=DELETE"},
+}
+
+
+def wsgi_request(application, method: str, path: str, query: str = "", body: bytes = b"",
+                 bandwidth: float = None) -> int:
+    """
+    Вызывает WSGI-приложение так же, как это делает WSGI-сервер
+
+    В отличие от тестового клиента, срабатывают сигналы начала и конца
+    запроса, поэтому соединения с базой закрываются или переиспользуются
+    по CONN_MAX_AGE.
+
+    Принимает:
+        bandwidth (float, optional): Скорость клиента в байтах в секунду:
+            ответ читается с такой скоростью, как у медленного клиента
+
+    Возвращает:
+        int - код ответа
+    """
+    throttle = Throttle(bandwidth)
+    status = []
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+    }
+    result = application(environ, lambda code, headers, exc_info=None: status.append(code))
+    try:
+        for chunk in result:
+            time.sleep(throttle(chunk))
+    finally:
+        result.close()
+    return int(status[0].split()[0])
+
+
+class Throttle:
+    """
+    Считает, сколько должен ждать клиент с ограниченной скоростью после очередной порции
+
+    Ожидание накапливается и отдается порциями не меньше 10 мс, чтобы не
+    вызывать sleep на каждую строку выгрузки.
+    """
+    def __init__(self, bandwidth: float = None):
+        self.bandwidth = bandwidth
+        self.pending = 0.0
+
+    def __call__(self, chunk: bytes) -> float:
+        if not self.bandwidth:
+            return 0
+        self.pending += len(chunk) / self.bandwidth
+        if self.pending < 0.01:
+            return 0
+        delay, self.pending = self.pending, 0.0
+        return delay
+
+
+async def asgi_request(application, method: str, path: str, query: str = "", bandwidth: float = None) -> int:
+    """
+    Вызывает ASGI-приложение так же, как это делает ASGI-сервер
+
+    Принимает:
+        bandwidth (float, optional): Скорость клиента в байтах в секунду (см. wsgi_request)
+
+    Возвращает:
+        int - код ответа
+    """
+    throttle = Throttle(bandwidth)
+    status = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Клиент не отключается; ожидание отменяется, когда ответ отправлен
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body":
+            delay = throttle(message.get("body", b""))
+            if delay:
+                await asyncio.sleep(delay)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    await application(scope, receive, send)
+    return status[0]
+
+
+class ThreadSampler:
+    """
+    Замеряет максимальное число потоков процесса, пока открыт контекст
+    """
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _client_results(timings: list[float], codes: list[int], elapsed: float, peak_threads: int) -> dict:
+    return {
+        "clients": len(timings),
+        "errors": sum(code >= 400 for code in codes),
+        "total_s": round(elapsed, 3),
+        "rps": round(len(timings) / elapsed, 1),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "peak_threads": peak_threads,
+    }
+
+
+def run_wsgi_export_clients(clients=100, threads=8, bandwidth=256 * 1024, query="") -> dict:
+    """
+    Обслуживает clients медленных клиентов выгрузки синхронным WSGI-приложением
+    с фиксированным пулом потоков (как gunicorn --threads)
+
+    Принимает:
+        clients: int - количество клиентов, все приходят одновременно
+        threads: int - потоков в пуле
+        bandwidth: float - скорость каждого клиента, байт/с
+        query: str - параметры GET /api/v1/records/export/
+
+    Возвращает:
+        dict - clients, errors, total_s, rps, p50_ms, p95_ms, peak_threads
+    """
+    application = WSGIHandler()
+    start = time.perf_counter()
+
+    def serve(_):
+        # Время клиента считается от общего старта: сюда входит ожидание свободного потока
+        code = wsgi_request(application, "GET", "/api/v1/records/export/", query, bandwidth=bandwidth)
+        connections.close_all()
+        return time.perf_counter() - start, code
+
+    with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(serve, range(clients)))
+    elapsed = time.perf_counter() - start
+    return _client_results([r[0] for r in results], [r[1] for r in results], elapsed, sampler.peak)
+
+
+def run_asgi_export_clients(clients=100, bandwidth=256 * 1024, query="") -> dict:
+    """
+    Обслуживает clients медленных клиентов выгрузки ASGI-приложением (как dds.asgi) в одном event loop
+
+    Параметры и результат - как у run_wsgi_export_clients.
+    """
+    application = ASGIHandler()
+
+    async def serve(start):
+        code = await asgi_request(application, "GET", "/api/v1/records/export/", query, bandwidth=bandwidth)
+        return time.perf_counter() - start, code
+
+    async def run():
+        start = time.perf_counter()
+        return await asyncio.gather(*(serve(start) for _ in range(clients)))
+
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+    return _client_results([r[0] for r in results], [r[1] for r in results], elapsed, sampler.peak)
+
+
+def run_concurrency_benchmark(ledger: dict, readers=8, writers=2, duration=5.0) -> dict:
+    """
+    Нагружает API записей параллельными читателями и писателями
+
+    Каждый поток - воркер WSGI-сервера с постоянным потоком: читатели
+    запрашивают страницы списка с фильтрами, писатели создают и меняют записи.
+    Ошибки 5xx (под нагрузкой это "database is locked") считаются отдельно.
+
+    Принимает:
+        ledger: dict - результат seed_ledger
+        readers: int - количество потоков чтения
+        writers: int - количество потоков записи
+        duration: float - длительность нагрузки в секундах
+
+    Возвращает:
+        dict - по "read" и "write": requests, errors, rps, p50_ms, p95_ms
+    """
+    application = WSGIHandler()
+    ids = list(Records.objects.values_list("pk", flat=True)[:1000])
+    subcategory = ledger["subcategories"][0]
+    category = subcategory.category
+    new_record = json.dumps({
+        "status": ledger["statuses"][0].title,
+        "type": category.type.title,
+        "category": category.title,
+        "subcategory": subcategory.title,
+        "amount": 1500,
+    }).encode()
+    connections.close_all()
+
+    outcomes = {"read": [], "write": []}
+    deadline = time.monotonic() + duration
+
+    def read(rng):
+        query = f"category_id={rng.choice(ledger['categories']).pk}&page_size=50"
+        return wsgi_request(application, "GET", "/api/v1/records/", query)
+
+    def write(rng):
+        if rng.random() < 0.5:
+            return wsgi_request(application, "POST", "/api/v1/records/", body=new_record)
+        body = json.dumps({"amount": rng.randint(100, 100_000)}).encode()
+        return wsgi_request(application, "PATCH", f"/api/v1/records/{rng.choice(ids)}/", body=body)
+
+    def worker(kind, send, seed):
+        rng = random.Random(seed)
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                code = send(rng)
+                outcomes[kind].append((time.perf_counter() - start, code))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=("read", read, i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", write, readers + i)) for i in range(writers)]
+    # Ошибки блокировок и медленные запросы ожидаемы и считаются, в лог их не пишем
+    loggers = [logging.getLogger(name) for name in ("django.request", "records.metrics")]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.CRITICAL)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+
+    results = {}
+    for kind, values in outcomes.items():
+        values = [elapsed for elapsed, code in values]
+        results[kind] = {
+            "requests": len(values),
+            "errors": sum(code >= 500 for _, code in outcomes[kind]),
+            "rps": round(len(values) / duration, 1),
+            "p50_ms": round(percentile(values, 0.5) * 1000, 3) if values else None,
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3) if values else None,
+        }
+    return results
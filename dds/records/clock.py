@@ -0,0 +1,38 @@
+import contextlib
+
+from django.utils import timezone
+
+_now = timezone.now
+
+
+def now():
+    """
+    Возвращает текущий момент времени (aware datetime) по часам приложения
+    """
+    return _now()
+
+
+def today():
+    """
+    Возвращает текущую дату в часовом поясе TIME_ZONE по часам приложения
+
+    Вызывается при каждом обращении, поэтому долго работающий процесс
+    не застревает на дате своего запуска.
+    """
+    return timezone.localdate(_now())
+
+
+@contextlib.contextmanager
+def override_clock(func):
+    """
+    Временно подменяет часы приложения (например, в тестах)
+
+    Принимает:
+        func: Callable[[], datetime] - функция, возвращающая aware datetime
+    """
+    global _now
+    previous, _now = _now, func
+    try:
+        yield
+    finally:
+        _now = previous
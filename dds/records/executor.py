@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """
+    Общий пул потоков для чтения выгрузки из async-представления
+
+    Размер пула - RECORDS_ASYNC_DB_THREADS, он не зависит от числа
+    одновременных выгрузок: лишние пачки ждут свободный поток в очереди.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.RECORDS_ASYNC_DB_THREADS,
+                                               thread_name_prefix="records-db")
+    return _executor
+
+
+def _call(func, args, kwargs):
+    # Потоки пула живут дольше запроса: соединения проверяются перед каждым вызовом,
+    # как между запросами (CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию, работающую с ORM, в общем пуле get_db_executor
+
+    Используется только для пачек выгрузки (aiter_records_rows): в отличие от
+    sync_to_async(thread_sensitive=True), соединение с базой принадлежит потоку пула,
+    а не запросу, и медленный клиент его не держит. Цена - очередь: одновременно
+    читается не больше RECORDS_ASYNC_DB_THREADS пачек. Остальные запросы
+    async-представлений идут через async ORM Django.
+    Контекстные переменные (например, primary_pinning) передаются в поток пула.
+    При RECORDS_ASYNC_DB_THREADS = 0 вызов идет через sync_to_async, как в Django
+    по умолчанию (например, чтобы тесты в транзакции видели свои данные).
+
+    Принимает:
+        func: Callable - функция и ее аргументы
+
+    Возвращает:
+        результат func
+    """
+    if not settings.RECORDS_ASYNC_DB_THREADS:
+        return await sync_to_async(func)(*args, **kwargs)
+    return await sync_to_async(_call, thread_sensitive=False, executor=get_db_executor())(func, args, kwargs)
@@ -0,0 +1,85 @@
+import csv
+
+from records.renderers import dumps
+from records.selectors import RECORD_ROW_FIELDS
+
+EXPORT_HEADER = ("id",) + RECORD_ROW_FIELDS[1:]
+
+
+class Echo:
+    """
+    Псевдо-файл для csv.writer: вместо записи возвращает строку
+    """
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """
+    Построчно превращает записи в CSV, начиная с заголовка
+
+    Принимает:
+        rows: Iterable[tuple] - строки в порядке RECORD_ROW_FIELDS
+
+    Возвращает:
+        Iterator[str]
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    """
+    Построчно превращает записи в NDJSON (один JSON-объект на строку)
+
+    Принимает:
+        rows: Iterable[tuple] - строки в порядке RECORD_ROW_FIELDS
+
+    Возвращает:
+        Iterator[bytes]
+    """
+    for row in rows:
+        yield dumps(dict(zip(EXPORT_HEADER, row))) + b"\n"
+
+
+async def astream_csv(rows):
+    """
+    Асинхронный вариант stream_csv
+
+    Принимает:
+        rows: AsyncIterable[tuple] - строки в порядке RECORD_ROW_FIELDS
+
+    Возвращает:
+        AsyncIterator[str]
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    async for row in rows:
+        yield writer.writerow(row)
+
+
+async def astream_ndjson(rows):
+    """
+    Асинхронный вариант stream_ndjson
+
+    Принимает:
+        rows: AsyncIterable[tuple] - строки в порядке RECORD_ROW_FIELDS
+
+    Возвращает:
+        AsyncIterator[bytes]
+    """
+    async for row in rows:
+        yield dumps(dict(zip(EXPORT_HEADER, row))) + b"\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "ndjson": (stream_ndjson, "application/x-ndjson; charset=utf-8"),
+}
+
+ASYNC_EXPORT_FORMATS = {
+    "csv": (astream_csv, "text/csv; charset=utf-8"),
+    "ndjson": (astream_ndjson, "application/x-ndjson; charset=utf-8"),
+}
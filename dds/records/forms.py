@@ -1,26 +1,122 @@
 from django import forms
-from django.db.models.query_utils import class_or_instance_method
-from unicodedata import category
+from django.conf import settings
+from django.contrib.admin.widgets import AutocompleteMixin, AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
 
-from records.models import Records, Category, Subcategory
+from records.models import Records
+from records.selectors import get_dictionary_item, get_reference_data
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """
+    Поле выбора элемента справочника из закэшированного снимка (get_reference_data)
+
+    Варианты задаются set_items, выбранное значение ищется в снимке,
+    поэтому ни отрисовка, ни проверка формы не обращаются к базе.
+    """
+    def set_items(self, items):
+        """
+        Задает варианты выбора
+
+        Принимает:
+            items: Iterable - элементы справочника из снимка
+        """
+        items = list(items)
+        self.allowed_ids = {item.pk for item in items}
+        # Автодополнение подгружает варианты само, в HTML попадает только выбранный
+        if not isinstance(getattr(self.widget, "widget", self.widget), AutocompleteMixin):
+            self.choices = [("", self.empty_label), *((item.pk, item.title) for item in items)]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            item = get_dictionary_item(self.queryset.model._meta.model_name, pk=int(value))
+        except (TypeError, ValueError, ValidationError):
+            item = None
+        if item is None or item.pk not in getattr(self, "allowed_ids", {item.pk}):
+            raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice",
+                                  params={"value": value})
+        return item
+
+
+class ReferenceAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения админ-панели для элемента справочника
+
+    Варианты ищутся через autocomplete админ-панели, а подпись выбранного
+    значения берется из закэшированного снимка, без запроса к базе.
+    """
+    def optgroups(self, name, value, attr=None):
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, "", "", False, 0))
+        field = self.field.remote_field.model._meta.model_name
+        for pk in value:
+            try:
+                item = get_dictionary_item(field, pk=int(pk))
+            except (TypeError, ValueError, ValidationError):
+                continue
+            options.append(self.create_option(name, item.pk, item.title, True, len(options)))
+        return [(None, options, 0)]
+
+
+class ChainedSelect(forms.Select):
+    """
+    Список дочерних элементов справочника (категорий или подкатегорий)
+
+    В HTML попадают только дети выбранного родителя. При смене родителя
+    records/admin/chained_select.js подгружает варианты из /api/v1/tree/children/.
+
+    Принимает:
+        parent: str - имя поля родителя: "type" или "category"
+    """
+    def __init__(self, parent: str, attrs=None):
+        super().__init__(attrs)
+        self.parent = parent
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-chained-parent"] = self.parent
+        attrs["data-chained-url"] = reverse_lazy("tree-children")
+        return attrs
+
+    @property
+    def media(self):
+        # Та же сборка jQuery, что у админ-панели, чтобы она не подключалась дважды
+        extra = "" if settings.DEBUG else ".min"
+        return forms.Media(js=(f"admin/js/vendor/jquery/jquery{extra}.js", "admin/js/jquery.init.js",
+                               "records/admin/chained_select.js"))
 
 
 class RecordForm(forms.ModelForm):
     class Meta:
         model = Records
         fields = '__all__'
+        field_classes = {name: ReferenceChoiceField for name in ("status", "type", "category", "subcategory")}
+        widgets = {"category": ChainedSelect("type"), "subcategory": ChainedSelect("category")}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Варианты берутся из дерева справочника, которое отдает и /api/v1/tree/
+        reference = get_reference_data()
+        self.fields['status'].set_items(reference.by_id['status'].values())
+        self.fields['type'].set_items(reference.by_id['type'].values())
+
+        # Без выбранного родителя список пуст: варианты подгрузит chained_select.js
+        type_id = self.get_parent_id('type')
+        self.fields['category'].set_items(reference.children['type'].get(type_id, []))
+        category_id = self.get_parent_id('category')
+        self.fields['subcategory'].set_items(reference.children['category'].get(category_id, []))
 
-        if 'type' in self.data:
-            type_id = int(self.data.get('type'))
-            self.fields['category'].queryset = Category.objects.filter(type_id=type_id)
-        elif self.instance.pk:
-            self.fields['category'].queryset = Category.objects.filter(type=self.instance.type)
-
-        if 'category' in self.data:
-            category_id = int(self.data.get('category'))
-            self.fields['subcategory'].queryset = Subcategory.objects.filter(category_id=category_id)
-        elif self.instance.pk:
-            self.fields['subcategory'].queryset = Subcategory.objects.filter(category=self.instance.category)
+    def get_parent_id(self, name: str):
+        """
+        ID выбранного родителя: из отправленных данных или из начальных значений
+        (поля редактируемой записи или параметры GET страницы добавления)
+        """
+        value = self.data.get(name) if name in self.data else self.initial.get(name)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,198 @@
+import contextlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+
+from records.export import EXPORT_FORMATS
+from records.models import Job
+from records.routers import primary_pinning
+from records.selectors import get_filtered_records, get_job_by_id, iter_records_row_pages
+from records.serializers import RecordsSerializer
+from records.services import (build_record, bulk_create_records, rebuild_daily_totals, update_job_progress,
+                              finish_job, fail_job)
+
+logger = logging.getLogger(__name__)
+
+# Сколько ошибок загрузки сохраняется в итоге задачи
+IMPORT_ERRORS_LIMIT = 100
+
+
+def get_job_path(name: str) -> Path:
+    """
+    Путь к файлу задачи в RECORDS_JOBS_DIR (каталог создается при необходимости)
+    """
+    directory = Path(settings.RECORDS_JOBS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / name
+
+
+def save_job_upload(chunks) -> str:
+    """
+    Сохраняет тело запроса загрузки в RECORDS_JOBS_DIR, не собирая его в памяти
+
+    Принимает:
+        chunks: Iterable[bytes] - части тела запроса
+
+    Возвращает:
+        str - имя файла для параметра "source" задачи Job.IMPORT
+    """
+    name = f"import-{uuid.uuid4().hex}.ndjson"
+    with open(get_job_path(name), "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return name
+
+
+def run_export_job(job: Job, progress) -> tuple[dict, str]:
+    """
+    Выгружает отфильтрованные записи в файл
+
+    Параметры задачи:
+        output (str, optional): "csv" или "ndjson". По умолчанию: csv
+        filters (dict, optional): Именованные аргументы get_filtered_records
+    """
+    output = job.params.get("output", "csv")
+    if output not in EXPORT_FORMATS:
+        raise ValidationError("Unsupported output format")
+    query = get_filtered_records(**job.params.get("filters", {}))
+    total = query.count()
+    progress(0, total)
+
+    processed = 0
+
+    def rows():
+        # Прогресс пишется между пачками, когда чтение уже завершено
+        nonlocal processed
+        for page in iter_records_row_pages(query):
+            yield from page
+            processed += len(page)
+            progress(processed)
+
+    stream, _ = EXPORT_FORMATS[output]
+    name = f"job-{job.pk}-records.{output}"
+    path = get_job_path(name)
+    # Файл появляется под итоговым именем только целиком
+    partial = path.with_name(name + ".part")
+    try:
+        with open(partial, "wb") as f:
+            for part in stream(rows()):
+                f.write(part if isinstance(part, bytes) else part.encode())
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    os.replace(partial, path)
+    progress(processed, processed)
+    return {"records": processed}, name
+
+
+def run_import_job(job: Job, progress) -> tuple[dict, str]:
+    """
+    Загружает записи из NDJSON-файла пачками по RECORDS_BULK_BATCH_SIZE
+
+    Строки проверяются как в POST /api/v1/records/bulk/. Исходный файл
+    удаляется после загрузки.
+
+    Параметры задачи:
+        source (str): Имя файла в RECORDS_JOBS_DIR (см. save_job_upload)
+        strict (bool, optional): Если true, при любой ошибке ничего не сохраняется
+    """
+    path = get_job_path(job.params["source"])
+    strict = job.params.get("strict", False)
+    with open(path, "rb") as f:
+        total = sum(1 for line in f if line.strip())
+    progress(0, total)
+
+    created, processed, errors, errors_count = 0, 0, [], 0
+    batch = []
+
+    def flush():
+        nonlocal created
+        if batch:
+            created += len(bulk_create_records(batch))
+            batch.clear()
+        progress(processed)
+
+    with transaction.atomic() if strict else contextlib.nullcontext():
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                index, processed = processed, processed + 1
+                try:
+                    serializer = RecordsSerializer(data=json.loads(line))
+                    if not serializer.is_valid():
+                        raise ValidationError(serializer.errors)
+                    batch.append(build_record(serializer.validated_data))
+                except (ValueError, ValidationError) as e:
+                    errors_count += 1
+                    if len(errors) < IMPORT_ERRORS_LIMIT:
+                        error = getattr(e, "message_dict", None) or getattr(e, "messages", None) or str(e)
+                        errors.append({"index": index, "error": error})
+                if len(batch) >= settings.RECORDS_BULK_BATCH_SIZE:
+                    flush()
+            flush()
+        if strict and errors_count:
+            transaction.set_rollback(True)
+            created = 0
+    path.unlink()
+    return {"created": created, "errors": errors, "errors_count": errors_count}, ""
+
+
+def run_rebuild_daily_totals_job(job: Job, progress) -> tuple[dict, str]:
+    """
+    Пересобирает суммы за день (см. rebuild_daily_totals)
+    """
+    rows = rebuild_daily_totals()
+    progress(rows, rows)
+    return {"rows": rows}, ""
+
+
+JOB_HANDLERS = {
+    Job.EXPORT: run_export_job,
+    Job.IMPORT: run_import_job,
+    Job.REBUILD_DAILY_TOTALS: run_rebuild_daily_totals_job,
+}
+
+
+def run_job(pk: int) -> str:
+    """
+    Выполняет забранную задачу (см. claim_job) и сохраняет ее итог
+
+    Вызывается в процессе пула команды run_jobs. Ошибка обработчика
+    не выходит наружу, а сохраняется в задаче.
+
+    Принимает:
+        pk: int - ID задачи в состоянии "running"
+
+    Возвращает:
+        str - итоговое состояние задачи
+    """
+    # Задача только что изменена воркером, поэтому все чтения идут с основного сервера
+    with primary_pinning(pinned=True):
+        try:
+            job = get_job_by_id(pk)
+            result, result_file = JOB_HANDLERS[job.kind](job, lambda *args: update_job_progress(pk, *args))
+        except Exception as e:
+            logger.exception("Job %s failed", pk)
+            fail_job(pk, f"{type(e).__name__}: {e}")
+            return Job.FAILED
+        finish_job(pk, result, result_file)
+        return Job.DONE
+
+
+def execute_job(pk: int) -> str:
+    """
+    Точка входа процесса пула: run_job между проверками соединений с базой,
+    как между запросами (соединения живут CONN_MAX_AGE)
+    """
+    close_old_connections()
+    try:
+        return run_job(pk)
+    finally:
+        close_old_connections()
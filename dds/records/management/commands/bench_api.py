@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from records.benchmarks import run_api_benchmark, seed_ledger
+
+
+class Command(BaseCommand):
+    help = ("Заполняет временную базу синтетическим справочником и записями и замеряет "
+            "p50/p95, число SQL-запросов и пропускную способность основных сценариев API")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=100_000, help="Количество записей")
+        parser.add_argument("--statuses", type=int, default=3, help="Количество статусов")
+        parser.add_argument("--types", type=int, default=2, help="Количество типов операций")
+        parser.add_argument("--categories-per-type", type=int, default=10, help="Категорий на тип")
+        parser.add_argument("--subcategories-per-category", type=int, default=8,
+                            help="Подкатегорий на категорию")
+        parser.add_argument("--repeat", type=int, default=50, help="Повторов каждого сценария")
+        parser.add_argument("--seed", type=int, default=0, help="Зерно генератора случайных чисел")
+        parser.add_argument("--output", help="Файл для результатов в формате JSON")
+        parser.add_argument("--baseline", help="JSON предыдущего запуска для сравнения")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as f:
+                    baseline = json.load(f)["results"]
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Не удалось прочитать baseline: {e}")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Заполнение {options['records']} записей...")
+            ledger = seed_ledger(
+                records=options["records"],
+                statuses=options["statuses"],
+                types=options["types"],
+                categories_per_type=options["categories_per_type"],
+                subcategories_per_category=options["subcategories_per_category"],
+                seed=options["seed"],
+            )
+            results = run_api_benchmark(ledger, repeat=options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        params = {name: options[name] for name in (
+            "records", "statuses", "types", "categories_per_type",
+            "subcategories_per_category", "repeat", "seed",
+        )}
+        self.stdout.write(f"{'сценарий':<10}{'p50 ms':>10}{'p95 ms':>10}{'запросов':>10}{'rps':>10}")
+        for name, result in results.items():
+            line = (f"{name:<10}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                    f"{result['queries']:>10}{result['throughput_rps']:>10.1f}")
+            if baseline and name in baseline and baseline[name]["p50_ms"]:
+                change = result["p50_ms"] / baseline[name]["p50_ms"] - 1
+                line += f"   p50 {change:+.0%} к baseline"
+            self.stdout.write(line)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"params": params, "results": results}, f, ensure_ascii=False, indent=2)
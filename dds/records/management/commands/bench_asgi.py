@@ -0,0 +1,88 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from records import clock
+from records.benchmarks import run_asgi_export_clients, run_wsgi_export_clients, seed_ledger
+
+MODES = ("wsgi", "asgi")
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает WSGI и ASGI развертывания на одинаковом числе одновременных медленных "
+            "клиентов выгрузки: время, задержки и максимальное число потоков процесса")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=20_000, help="Количество записей")
+        parser.add_argument("--clients", type=int, default=100, help="Одновременных клиентов")
+        parser.add_argument("--threads", type=int, default=8, help="Потоков WSGI-сервера")
+        parser.add_argument("--bandwidth", type=float, default=256 * 1024,
+                            help="Скорость каждого клиента, байт/с")
+        parser.add_argument("--days", type=int, default=30, help="Глубина выгрузки в днях")
+        parser.add_argument("--output", help="Файл для результатов в формате JSON")
+        parser.add_argument("--worker", choices=("seed",) + MODES,
+                            help="Внутренний режим: выполнить одну часть бенчмарка в этом процессе")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            return self.run_worker(options)
+
+        # Каждое развертывание запускается отдельным процессом со своими
+        # представлениями (DDS_ASYNC_VIEWS) над общим временным файлом SQLite
+        directory = tempfile.mkdtemp()
+        env = {**os.environ, "DDS_DB_ENGINE": "sqlite", "DDS_DB_NAME": os.path.join(directory, "bench.sqlite3")}
+        results = {}
+        try:
+            self.call(["migrate", "--verbosity", "0"], env)
+            self.stdout.write(f"Заполнение {options['records']} записей...")
+            self.call(["bench_asgi", "--worker", "seed", "--records", str(options["records"])], env)
+            for mode in MODES:
+                output = self.call([
+                    "bench_asgi", "--worker", mode,
+                    "--clients", str(options["clients"]),
+                    "--threads", str(options["threads"]),
+                    "--bandwidth", str(options["bandwidth"]),
+                    "--days", str(options["days"]),
+                ], {**env, "DDS_ASYNC_VIEWS": "1" if mode == "asgi" else "0"})
+                results[mode] = json.loads(output.splitlines()[-1])
+        finally:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode}: {result['total_s']:.2f} s, {result['rps']} rps, p50 {result['p50_ms']:.0f} ms, "
+                f"p95 {result['p95_ms']:.0f} ms, ошибок {result['errors']}, потоков {result['peak_threads']}"
+            )
+        if options["output"]:
+            params = {name: options[name] for name in ("records", "clients", "threads", "bandwidth", "days")}
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"params": params, "results": results}, f, ensure_ascii=False, indent=2)
+
+    def call(self, args, env) -> str:
+        process = subprocess.run(
+            [sys.executable, "manage.py", *args],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return process.stdout
+
+    def run_worker(self, options):
+        if options["worker"] == "seed":
+            seed_ledger(records=options["records"])
+            return
+        date_from = clock.today() - datetime.timedelta(days=options["days"])
+        query = f"date_from={date_from.isoformat()}"
+        if options["worker"] == "wsgi":
+            result = run_wsgi_export_clients(options["clients"], options["threads"], options["bandwidth"], query)
+        else:
+            result = run_asgi_export_clients(options["clients"], options["bandwidth"], query)
+        self.stdout.write(json.dumps(result))
@@ -0,0 +1,94 @@
+import datetime
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.models import Sum
+
+from records import clock
+from records.benchmarks import seed_ledger
+from records.models import Records
+from records.selectors import get_filtered_records
+
+# Одиночные индексы внешних ключей, которые были до составных индексов
+LEGACY_INDEXES = [
+    models.Index(fields=[field], name=f"records_legacy_{field}_idx")
+    for field in ("status", "type", "category", "subcategory")
+]
+
+
+class Command(BaseCommand):
+    help = ("Заполняет временную SQLite базу синтетическими записями и сравнивает "
+            "планы и время запросов get_filtered_records до и после составных индексов")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Количество записей")
+        parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого запроса")
+        parser.add_argument("--output", help="Файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Заполнение {options['rows']} записей...")
+            ledger = seed_ledger(records=options["rows"])
+            queries = self.get_queries(ledger)
+
+            self.swap_indexes(remove=Records._meta.indexes, add=LEGACY_INDEXES)
+            before = self.measure(queries, options["repeat"])
+            self.swap_indexes(remove=LEGACY_INDEXES, add=Records._meta.indexes)
+            after = self.measure(queries, options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {"rows": options["rows"], "before": before, "after": after}
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, result in (("до", before[name]), ("после", after[name])):
+                self.stdout.write(f"  {label}: {result['median_ms']:.2f} ms")
+                for line in result["plan"].splitlines():
+                    self.stdout.write(f"    {line}")
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def get_queries(self, ledger):
+        """
+        Типовые запросы списка и сумм за последний год
+        """
+        date_to = clock.today()
+        period = {"date_from": date_to - datetime.timedelta(days=365), "date_to": date_to}
+        category = ledger["categories"][0]
+        subcategory = ledger["subcategories"][0]
+
+        def page(**filters):
+            return get_filtered_records(**period, **filters).order_by("-date", "-pk")[:100]
+
+        return {
+            "date_range": page(),
+            "type": page(type=category.type.title),
+            "status": page(status=ledger["statuses"][0].title),
+            "category": page(category=category.title),
+            "subcategory": page(subcategory=subcategory.title),
+            "amount_by_type": (get_filtered_records(**period)
+                               .values("type").annotate(total=Sum("amount")).order_by()),
+        }
+
+    def swap_indexes(self, remove, add):
+        with connection.schema_editor() as editor:
+            for index in remove:
+                editor.remove_index(Records, index)
+            for index in add:
+                editor.add_index(Records, index)
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, query in queries.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(query.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = {"plan": query.explain(), "median_ms": statistics.median(timings)}
+        return results
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from records.benchmarks import run_serialization_benchmark, seed_ledger
+from records.models import Records
+from records.selectors import get_records_rows
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает скорость сериализации записей через RecordsSerializer и JSONRenderer "
+            "с быстрым путем serialize_record_rows и FastJSONRenderer")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000, help="Количество записей в ответе")
+        parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого варианта")
+        parser.add_argument("--output", help="Файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            seed_ledger(records=options["rows"])
+            rows = get_records_rows(Records.objects.order_by("-date", "-pk"))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = run_serialization_benchmark(rows, repeat=options["repeat"])
+        for name, result in results.items():
+            self.stdout.write(f"{name:<12}{result['median_ms']:>10.2f} ms{result['records_per_second']:>12} записей/с")
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"rows": options["rows"], "results": results}, f, ensure_ascii=False, indent=2)
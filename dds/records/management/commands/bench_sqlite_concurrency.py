@@ -0,0 +1,59 @@
+import copy
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, DEFAULT_DB_ALIAS
+
+from records.benchmarks import run_concurrency_benchmark, seed_ledger, SQLITE_DEFAULT_PROFILE
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пропускную способность и ошибки блокировок API записей при параллельных "
+            "читателях и писателях на SQLite с настройками по умолчанию и с профилем из settings")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=50_000, help="Количество записей")
+        parser.add_argument("--readers", type=int, default=8, help="Потоков чтения")
+        parser.add_argument("--writers", type=int, default=4, help="Потоков записи")
+        parser.add_argument("--duration", type=float, default=10.0, help="Длительность каждого прогона, с")
+        parser.add_argument("--output", help="Файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        db_settings = connections.settings[DEFAULT_DB_ALIAS]
+        if db_settings["ENGINE"] != "django.db.backends.sqlite3":
+            self.stderr.write("Бенчмарк рассчитан на SQLite")
+            return
+        original = copy.deepcopy(db_settings)
+        # Нужен файл: у базы в памяти нет ни журнала, ни конкурирующих соединений
+        directory = tempfile.mkdtemp()
+        db_settings["TEST"] = {**db_settings["TEST"], "NAME": os.path.join(directory, "bench.sqlite3")}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        results = {}
+        try:
+            self.stdout.write(f"Заполнение {options['records']} записей...")
+            ledger = seed_ledger(records=options["records"])
+            # Профиль по умолчанию первым: переключиться из WAL обратно
+            # можно только без других открытых соединений
+            for name, profile in (("default", SQLITE_DEFAULT_PROFILE), ("tuned", original)):
+                db_settings.update({key: copy.deepcopy(profile[key]) for key in SQLITE_DEFAULT_PROFILE})
+                connection.close()
+                results[name] = run_concurrency_benchmark(
+                    ledger, readers=options["readers"], writers=options["writers"], duration=options["duration"],
+                )
+        finally:
+            db_settings.update({key: original[key] for key in SQLITE_DEFAULT_PROFILE})
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            db_settings["TEST"] = original["TEST"]
+            os.rmdir(directory)
+
+        for name, result in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for kind, stats in result.items():
+                self.stdout.write(f"  {kind:<6}{stats['rps']:>9.1f} rps  p50 {stats['p50_ms']} ms  "
+                                  f"p95 {stats['p95_ms']} ms  ошибок {stats['errors']}")
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"params": {k: options[k] for k in ("records", "readers", "writers", "duration")},
+                           "results": results}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from records.selectors import get_daily_totals_mismatches
+from records.services import rebuild_daily_totals
+
+
+class Command(BaseCommand):
+    help = "Пересобирает суммы за день (DailyTotals) по таблице записей и сверяет результат"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify-only", action="store_true",
+                            help="Только сверить сводку с записями, ничего не меняя")
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            rows = rebuild_daily_totals()
+            self.stdout.write(f"Пересобрано строк DailyTotals: {rows}")
+
+        mismatches = get_daily_totals_mismatches()
+        for mismatch in mismatches[:20]:
+            self.stderr.write(f"{mismatch['key']}: ожидалось {mismatch['expected']}, в сводке {mismatch['actual']}")
+        if mismatches:
+            raise CommandError(f"Расхождений DailyTotals с записями: {len(mismatches)}")
+        self.stdout.write(self.style.SUCCESS("DailyTotals совпадает с записями"))
@@ -0,0 +1,85 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from records.jobs import execute_job, run_job
+from records.models import Job
+from records.selectors import get_queued_job_ids
+from records.services import claim_job, fail_job, requeue_running_jobs
+
+
+class Command(BaseCommand):
+    help = ("Выполняет фоновые задачи (выгрузки, загрузки, пересборку сумм) из очереди Job "
+            "в пуле процессов без внешнего брокера")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=settings.RECORDS_JOB_PROCESSES,
+                            help="Процессов в пуле; 0 - выполнять задачи в этом процессе")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Пауза между проверками очереди, секунд")
+        parser.add_argument("--once", action="store_true",
+                            help="Выполнить задачи, которые уже в очереди, и завершиться")
+        parser.add_argument("--requeue-running", action="store_true",
+                            help="Перед запуском вернуть в очередь задачи, оставшиеся в состоянии running "
+                                 "(если единственный воркер был остановлен аварийно)")
+
+    def handle(self, *args, **options):
+        if options["requeue_running"]:
+            self.stdout.write(f"Возвращено в очередь задач: {requeue_running_jobs()}")
+        if options["processes"] <= 0:
+            return self.run_inline(options)
+
+        processes = options["processes"]
+        # spawn: процессы пула не наследуют открытые соединения с базой;
+        # Django настраивается в них до импорта records.jobs
+        context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(processes, mp_context=context, initializer=django.setup)
+        running = {}
+        try:
+            while True:
+                close_old_connections()
+                free = processes - len(running)
+                for pk in get_queued_job_ids(free) if free else []:
+                    if claim_job(pk):
+                        running[pool.submit(execute_job, pk)] = pk
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                done, _ = wait(running, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    pk = running.pop(future)
+                    try:
+                        self.stdout.write(f"Задача {pk}: {future.result()}")
+                    except Exception as e:
+                        # Процесс пула упал (например, из-за нехватки памяти)
+                        # или не смог сохранить итог задачи
+                        fail_job(pk, f"{type(e).__name__}: {e}")
+                        self.stderr.write(f"Задача {pk}: {Job.FAILED} ({type(e).__name__}: {e})")
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                if broken:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(processes, mp_context=context, initializer=django.setup)
+        except KeyboardInterrupt:
+            self.stdout.write("Остановка: ожидание выполняющихся задач...")
+        finally:
+            pool.shutdown(wait=True)
+
+    def run_inline(self, options):
+        while True:
+            ids = get_queued_job_ids(1)
+            if not ids:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+            if claim_job(ids[0]):
+                self.stdout.write(f"Задача {ids[0]}: {run_job(ids[0])}")
@@ -0,0 +1,190 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus с метками (route, method)
+
+    Хранится в памяти процесса; observe защищен блокировкой
+    и стоит один bisect и несколько сложений.
+    """
+    def __init__(self, name: str, documentation: str, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for (route, method), counts, total in series:
+            label = f'route="{_escape(route)}",method="{_escape(method)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "dds_request_duration_seconds", "Total request latency", LATENCY_BUCKETS)
+DB_DURATION = Histogram(
+    "dds_db_duration_seconds", "Total time spent in SQL queries per request", LATENCY_BUCKETS)
+DB_QUERIES = Histogram(
+    "dds_db_queries", "Number of SQL queries per request", QUERY_COUNT_BUCKETS)
+SERIALIZATION_DURATION = Histogram(
+    "dds_serialization_duration_seconds", "Response rendering time per request", LATENCY_BUCKETS)
+HISTOGRAMS = (REQUEST_DURATION, DB_DURATION, DB_QUERIES, SERIALIZATION_DURATION)
+
+
+class QueryCounter:
+    """
+    Обертка execute_wrapper: считает SQL-запросы и время их выполнения
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+# Счетчик запросов текущего HTTP-запроса. Контекстная переменная передается
+# в потоки sync_to_async и run_in_db_thread вместе с запросом
+_query_counter = contextvars.ContextVar("records_query_counter", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """
+    Обертка execute_wrapper всех соединений: передает запрос счетчику текущего HTTP-запроса
+    """
+    counter = _query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # Обертка ставится на соединение любого потока, в котором выполняются запросы:
+    # потока WSGI-сервера, sync_to_async или пула run_in_db_thread
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class MetricsMiddleware:
+    """
+    Собирает по каждому маршруту и методу количество SQL-запросов, время в базе,
+    время рендеринга ответа и общее время запроса
+
+    Пишет предупреждение в лог, если запрос дольше METRICS_SLOW_REQUEST_MS
+    или выполнил больше METRICS_MAX_QUERIES запросов (например, N+1).
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        request._metrics_render_time = 0.0
+        start = time.perf_counter()
+        token = _query_counter.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self.observe(request, counter, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        request._metrics_render_time = 0.0
+        start = time.perf_counter()
+        token = _query_counter.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self.observe(request, counter, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, counter: QueryCounter, duration: float):
+        match = request.resolver_match
+        labels = (match.route if match else "unmatched", request.method)
+        REQUEST_DURATION.observe(labels, duration)
+        DB_DURATION.observe(labels, counter.duration)
+        DB_QUERIES.observe(labels, counter.count)
+        SERIALIZATION_DURATION.observe(labels, request._metrics_render_time)
+
+        if counter.count > settings.METRICS_MAX_QUERIES or duration * 1000 > settings.METRICS_SLOW_REQUEST_MS:
+            logger.warning(
+                "%s %s: %d queries, %.1f ms in DB, %.1f ms total",
+                request.method, labels[0], counter.count, counter.duration * 1000, duration * 1000,
+            )
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render_time = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """
+    Отдает собранные метрики в текстовом формате Prometheus
+    /metrics
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,72 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from records import clock
+from records.routers import primary_pinning
+
+
+class RequestClockMiddleware:
+    """
+    Фиксирует дату запроса в request.today
+
+    Все значения "сегодня" внутри одного запроса берутся из request.today,
+    поэтому запрос, пришедшийся на полночь, видит одну и ту же дату.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.today = clock.today()
+        return self.get_response(request)
+
+
+PRIMARY_COOKIE = "dds_primary_until"
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Закрепляет чтения клиента за основным сервером сразу после записи
+
+    Если запрос изменил данные, клиент получает cookie со сроком
+    RECORDS_PRIMARY_STICKY_SECONDS; пока срок не истек, его запросы читают
+    с основного сервера, а не с отстающей реплики.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with primary_pinning(pinned=self.is_pinned(request)) as state:
+            response = self.get_response(request)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        with primary_pinning(pinned=self.is_pinned(request)) as state:
+            response = await self.get_response(request)
+        return self.process_response(state, response)
+
+    def is_pinned(self, request) -> bool:
+        try:
+            return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def process_response(self, state, response):
+        if state["written"] and settings.RECORDS_REPLICA_DATABASE:
+            seconds = settings.RECORDS_PRIMARY_STICKY_SECONDS
+            response.set_cookie(PRIMARY_COOKIE, str(time.time() + seconds), max_age=seconds,
+                                httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0002_alter_category_title_alter_status_title_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'verbose_name': 'Категория', 'verbose_name_plural': 'Категории'},
+        ),
+        migrations.AlterModelOptions(
+            name='records',
+            options={'verbose_name': 'История записей', 'verbose_name_plural': 'Истории записей'},
+        ),
+        migrations.AlterModelOptions(
+            name='status',
+            options={'verbose_name': 'Статус', 'verbose_name_plural': 'Статусы'},
+        ),
+        migrations.AlterModelOptions(
+            name='subcategory',
+            options={'verbose_name': 'Подкатегория', 'verbose_name_plural': 'Подкатегории'},
+        ),
+        migrations.AlterModelOptions(
+            name='type',
+            options={'verbose_name': 'Тип операции', 'verbose_name_plural': 'Типы операций'},
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='title',
+            field=models.CharField(unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='records',
+            name='amount',
+            field=models.IntegerField(verbose_name='Сумма операции'),
+        ),
+        migrations.AlterField(
+            model_name='records',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='records.category', verbose_name='Категория'),
+        ),
+        migrations.AlterField(
+            model_name='records',
+            name='comment',
+            field=models.TextField(blank=True, null=True, verbose_name='Комментарий'),
+        ),
+        migrations.AlterField(
+            model_name='records',
+            name='date',
+            field=models.DateField(auto_now_add=True, verbose_name='Дата'),
+        ),
+        migrations.AlterField(
+            model_name='records',
+            name='status',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='records.status', verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='records',
+            name='subcategory',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='records.subcategory', verbose_name='Подкатегория'),
+        ),
+        migrations.AlterField(
+            model_name='records',
+            name='type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='records.type', verbose_name='Тип операции'),
+        ),
+        migrations.AlterField(
+            model_name='status',
+            name='title',
+            field=models.CharField(unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='subcategory',
+            name='title',
+            field=models.CharField(unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='type',
+            name='title',
+            field=models.CharField(unique=True, verbose_name='Название'),
+        ),
+        migrations.AddIndex(
+            model_name='records',
+            index=models.Index(fields=['date'], name='records_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='records',
+            index=models.Index(fields=['type', 'date'], name='records_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='records',
+            index=models.Index(fields=['status', 'date'], name='records_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='records',
+            index=models.Index(fields=['category', 'date'], name='records_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='records',
+            index=models.Index(fields=['subcategory', 'date'], name='records_subcategory_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='records',
+            index=models.Index(fields=['date', 'type', 'status', 'category', 'subcategory', 'amount'], name='records_date_amount_idx'),
+        ),
+    ]
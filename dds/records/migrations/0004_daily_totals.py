@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_daily_totals(apps, schema_editor):
+    Records = apps.get_model('records', 'Records')
+    DailyTotals = apps.get_model('records', 'DailyTotals')
+    key = ('date', 'status_id', 'type_id', 'category_id', 'subcategory_id')
+    rows = Records.objects.values_list(*key).annotate(total=Sum('amount'), count=Count('pk')).order_by()
+    DailyTotals.objects.bulk_create(
+        (DailyTotals(**dict(zip(key, bucket)), amount=total, records_count=count)
+         for *bucket, total, count in rows.iterator()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0003_records_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('amount', models.BigIntegerField(default=0, verbose_name='Сумма операций')),
+                ('records_count', models.IntegerField(default=0, verbose_name='Количество операций')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='records.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='records.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='records.subcategory', verbose_name='Подкатегория')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='records.type', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Сумма за день',
+                'verbose_name_plural': 'Суммы за день',
+                'constraints': [models.UniqueConstraint(fields=('date', 'type', 'status', 'category', 'subcategory'), name='daily_totals_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(fill_daily_totals, migrations.RunPython.noop),
+    ]
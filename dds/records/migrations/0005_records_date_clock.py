@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:11
+
+import records.clock
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0004_daily_totals'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='records',
+            name='date',
+            field=models.DateField(default=records.clock.today, editable=False, verbose_name='Дата'),
+        ),
+    ]
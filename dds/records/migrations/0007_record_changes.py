@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:14
+
+import records.clock
+from django.db import migrations, models
+
+
+def log_existing_records(apps, schema_editor):
+    # Существующие записи попадают в журнал, чтобы синхронизация с нуля их получила
+    Records = apps.get_model('records', 'Records')
+    RecordChange = apps.get_model('records', 'RecordChange')
+    RecordChange.objects.bulk_create(
+        (RecordChange(record_id=pk, action='upsert')
+         for pk in Records.objects.order_by('pk').values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0006_updated_at_and_table_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.BigIntegerField(verbose_name='ID записи')),
+                ('action', models.CharField(choices=[('upsert', 'Создание или изменение'), ('delete', 'Удаление')], max_length=6, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(default=records.clock.now, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение записи',
+                'verbose_name_plural': 'Журнал изменений записей',
+            },
+        ),
+        migrations.RunPython(log_existing_records, migrations.RunPython.noop),
+    ]
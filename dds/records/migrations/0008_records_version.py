@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0007_record_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='records',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Индекс FTS5 с внешним содержимым: хранит только словарь, текст читается из records_records
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE records_records_fts USING fts5("
+    "comment, content='records_records', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER records_records_fts_insert AFTER INSERT ON records_records BEGIN "
+    "INSERT INTO records_records_fts(rowid, comment) VALUES (new.id, new.comment); END",
+    "CREATE TRIGGER records_records_fts_delete AFTER DELETE ON records_records BEGIN "
+    "INSERT INTO records_records_fts(records_records_fts, rowid, comment) VALUES ('delete', old.id, old.comment); END",
+    "CREATE TRIGGER records_records_fts_update AFTER UPDATE OF comment ON records_records BEGIN "
+    "INSERT INTO records_records_fts(records_records_fts, rowid, comment) VALUES ('delete', old.id, old.comment); "
+    "INSERT INTO records_records_fts(rowid, comment) VALUES (new.id, new.comment); END",
+    "INSERT INTO records_records_fts(records_records_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS records_records_fts_insert",
+    "DROP TRIGGER IF EXISTS records_records_fts_delete",
+    "DROP TRIGGER IF EXISTS records_records_fts_update",
+    "DROP TABLE IF EXISTS records_records_fts",
+]
+# Выражение индекса совпадает с SearchVector("comment", config="simple") в search_records
+POSTGRESQL_CREATE = [
+    "CREATE INDEX records_comment_search_idx ON records_records "
+    "USING gin (to_tsvector('simple'::regconfig, COALESCE(comment, '')))",
+]
+POSTGRESQL_DROP = ["DROP INDEX IF EXISTS records_comment_search_idx"]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0009_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordSearch',
+            fields=[
+                ('record', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='records.records')),
+                ('comment', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'records_records_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRESQL_CREATE}),
+            run_for_vendor({'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}),
+        ),
+    ]
@@ -1,6 +1,9 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.urls import reverse
 
+from records import clock
+
 
 
 
@@ -12,6 +15,7 @@ class Status(models.Model):
     title - название статуса
     """
     title = models.CharField(unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
 
     def __str__(self):
         return self.title
@@ -26,8 +30,10 @@ class Type(models.Model):
 
         Имеет поля:
         title - название типа операции
+        updated_at - время последнего изменения
     """
     title = models.CharField(unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
 
     def __str__(self):
         return self.title
@@ -42,9 +48,11 @@ class Category(models.Model):
 
         Имеет поля:
         title - название категории
+        updated_at - время последнего изменения
         type - тип операции (внешний ключ: Type)
     """
     title = models.CharField(unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
     type = models.ForeignKey(Type, on_delete=models.CASCADE)
 
     def __str__(self):
@@ -60,9 +68,11 @@ class Subcategory(models.Model):
 
         Имеет поля:
         title - название подкатегория
+        updated_at - время последнего изменения
         category - категория операции (внешний ключ: Category)
     """
     title = models.CharField(unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
 
     def __str__(self):
@@ -84,15 +94,20 @@ class Records(models.Model):
         subcategory - тип операции (внешний ключ: Subcategory)
         amount - сумма операции в рублях
         comment - комментарий (не обязателен)
+        updated_at - время последнего изменения
+        version - номер версии записи для оптимистичной блокировки
 
     """
-    date = models.DateField(auto_now_add=True, verbose_name="Дата")
-    status = models.ForeignKey(Status, on_delete=models.CASCADE, verbose_name="Статус")
-    type = models.ForeignKey(Type, on_delete=models.CASCADE, verbose_name="Тип операции")
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Категория")
-    subcategory = models.ForeignKey(Subcategory, on_delete=models.CASCADE, verbose_name="Подкатегория")
+    date = models.DateField(default=clock.today, editable=False, verbose_name="Дата")
+    status = models.ForeignKey(Status, on_delete=models.CASCADE, db_index=False, verbose_name="Статус")
+    type = models.ForeignKey(Type, on_delete=models.CASCADE, db_index=False, verbose_name="Тип операции")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, db_index=False, verbose_name="Категория")
+    subcategory = models.ForeignKey(Subcategory, on_delete=models.CASCADE, db_index=False,
+                                    verbose_name="Подкатегория")
     amount = models.IntegerField(verbose_name="Сумма операции")
     comment = models.TextField(null=True, blank=True, verbose_name="Комментарий")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name="Версия")
 
     def __str__(self):
         return f"{self.type} - {self.amount}р."
@@ -104,6 +119,200 @@ class Records(models.Model):
     class Meta:
         verbose_name="История записей"
         verbose_name_plural = "Истории записей"
+        # Индексы подобраны под get_filtered_records: фильтр по элементу
+        # справочника всегда идёт вместе с диапазоном дат, поэтому сначала
+        # равенство по внешнему ключу, затем date. Они же заменяют
+        # одиночные индексы внешних ключей.
+        indexes = [
+            models.Index(fields=["date"], name="records_date_idx"),
+            models.Index(fields=["type", "date"], name="records_type_date_idx"),
+            models.Index(fields=["status", "date"], name="records_status_date_idx"),
+            models.Index(fields=["category", "date"], name="records_category_date_idx"),
+            models.Index(fields=["subcategory", "date"], name="records_subcategory_date_idx"),
+            # Покрывающий индекс для сумм за период: агрегации по amount
+            # читаются из индекса без обращения к таблице
+            models.Index(
+                fields=["date", "type", "status", "category", "subcategory", "amount"],
+                name="records_date_amount_idx",
+            ),
+        ]
+
+
+class FullTextMatch(models.Lookup):
+    """
+    Полнотекстовое совпадение SQLite FTS5: <столбец> MATCH <запрос>
+    """
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class RecordSearch(models.Model):
+    """
+        Класс-модель полнотекстового индекса комментариев записей (только SQLite)
+
+        Виртуальная таблица FTS5 с внешним содержимым records_records:
+        создается миграцией 0010 и поддерживается триггерами на вставку,
+        изменение комментария и удаление записи. Django ею не управляет
+        и использует только для JOIN в search_records.
+
+        Имеет поля:
+        record - запись операции (rowid индекса равен ID записи)
+        comment - проиндексированный комментарий
+        rank - релевантность bm25 для текущего MATCH (меньше - релевантнее)
+    """
+    record = models.OneToOneField(Records, primary_key=True, db_column="rowid", on_delete=models.DO_NOTHING,
+                                  related_name="search")
+    comment = models.TextField()
+    rank = models.FloatField()
 
+    class Meta:
+        managed = False
+        db_table = "records_records_fts"
+
+
+RecordSearch._meta.get_field("comment").register_lookup(FullTextMatch)
 
 
+class DailyTotals(models.Model):
+    """
+        Класс-модель предрасчитанных сумм записей за день
+
+        Одна строка на сочетание (date, status, type, category, subcategory).
+        Поддерживается сервисами записей при создании, изменении и удалении,
+        пересобирается командой rebuild_daily_totals.
+
+        Имеет поля:
+        date - дата операций
+        status, type, category, subcategory - элементы справочника (внешние ключи)
+        amount - сумма операций
+        records_count - количество операций
+    """
+    date = models.DateField(verbose_name="Дата")
+    status = models.ForeignKey(Status, on_delete=models.CASCADE, verbose_name="Статус")
+    type = models.ForeignKey(Type, on_delete=models.CASCADE, verbose_name="Тип операции")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Категория")
+    subcategory = models.ForeignKey(Subcategory, on_delete=models.CASCADE, verbose_name="Подкатегория")
+    amount = models.BigIntegerField(default=0, verbose_name="Сумма операций")
+    records_count = models.IntegerField(default=0, verbose_name="Количество операций")
+
+    class Meta:
+        verbose_name = "Сумма за день"
+        verbose_name_plural = "Суммы за день"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "type", "status", "category", "subcategory"],
+                name="daily_totals_bucket_unique",
+            ),
+        ]
+
+
+class TableVersion(models.Model):
+    """
+        Класс-модель счетчика изменений таблицы
+
+        Увеличивается сервисами и сигналами при каждом изменении таблицы
+        и используется как дешевый водяной знак для ETag и Last-Modified.
+
+        Имеет поля:
+        name - имя таблицы ("records", "status", "type", "category", "subcategory")
+        version - номер версии, растет с каждым изменением
+        updated_at - время последнего изменения
+    """
+    name = models.CharField(max_length=32, unique=True, verbose_name="Таблица")
+    version = models.BigIntegerField(default=0, verbose_name="Версия")
+    updated_at = models.DateTimeField(verbose_name="Изменено")
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    class Meta:
+        verbose_name = "Версия таблицы"
+        verbose_name_plural = "Версии таблиц"
+
+
+class RecordChange(models.Model):
+    """
+        Класс-модель журнала изменений записей операций
+
+        Пишется сервисами записей при каждом создании, изменении и удалении.
+        ID строк журнала монотонно растут и служат токеном синхронизации:
+        клиент запрашивает изменения с ID больше последнего полученного.
+        ID видны в порядке выдачи: транзакции пишут журнал по очереди,
+        под блокировкой строки TableVersion "records" (см. log_record_changes),
+        поэтому строка с меньшим ID не может появиться после строки с большим.
+
+        Имеет поля:
+        record_id - ID записи (без внешнего ключа: запись могла быть удалена)
+        action - "upsert" (создание или изменение) или "delete" (удаление)
+        created_at - время изменения
+    """
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTIONS = [(UPSERT, "Создание или изменение"), (DELETE, "Удаление")]
+
+    record_id = models.BigIntegerField(verbose_name="ID записи")
+    action = models.CharField(max_length=6, choices=ACTIONS, verbose_name="Действие")
+    created_at = models.DateTimeField(default=clock.now, verbose_name="Время изменения")
+
+    def __str__(self):
+        return f"{self.action} #{self.record_id}"
+
+    class Meta:
+        verbose_name = "Изменение записи"
+        verbose_name_plural = "Журнал изменений записей"
+
+
+class Job(models.Model):
+    """
+        Класс-модель фоновой задачи
+
+        Задачи создаются API и выполняются командой run_jobs вне запроса.
+        Результат (файл выгрузки) сохраняется в RECORDS_JOBS_DIR.
+
+        Имеет поля:
+        kind - вид задачи ("export", "import", "rebuild_daily_totals")
+        params - параметры задачи
+        status - "queued", "running", "done" или "failed"
+        processed - сколько строк обработано
+        total - сколько строк всего (если известно)
+        result - итог задачи (например, количество созданных записей)
+        result_file - имя файла результата в RECORDS_JOBS_DIR
+        error - текст ошибки, если задача упала
+        created_at, started_at, finished_at - время создания, запуска и завершения
+    """
+    EXPORT = "export"
+    IMPORT = "import"
+    REBUILD_DAILY_TOTALS = "rebuild_daily_totals"
+    KINDS = [(EXPORT, "Выгрузка записей"), (IMPORT, "Загрузка записей"),
+             (REBUILD_DAILY_TOTALS, "Пересборка сумм за день")]
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [(QUEUED, "В очереди"), (RUNNING, "Выполняется"), (DONE, "Готово"), (FAILED, "Ошибка")]
+
+    kind = models.CharField(max_length=32, choices=KINDS, verbose_name="Вид задачи")
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="Параметры")
+    status = models.CharField(max_length=8, choices=STATUSES, default=QUEUED, verbose_name="Состояние")
+    processed = models.BigIntegerField(default=0, verbose_name="Обработано")
+    total = models.BigIntegerField(null=True, blank=True, verbose_name="Всего")
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Итог")
+    result_file = models.CharField(max_length=255, blank=True, verbose_name="Файл результата")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    created_at = models.DateTimeField(default=clock.now, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Запущена")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        # Воркер выбирает самую старую задачу в очереди
+        indexes = [models.Index(fields=["status", "created_at"], name="job_status_created_idx")]
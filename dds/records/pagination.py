@@ -0,0 +1,97 @@
+import base64
+import binascii
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+
+def encode_cursor(date: datetime.date, pk: int) -> str:
+    """
+    Кодирует позицию последней записи страницы (date, id) в непрозрачный токен
+
+    Принимает:
+        date: date - дата последней записи страницы
+        pk: int - ID последней записи страницы
+
+    Возвращает:
+        str - токен для параметра cursor
+    """
+    raw = f"{date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime.date, int]:
+    """
+    Декодирует токен cursor обратно в пару (date, id)
+    или выкидывает ошибку ValidationError, если токен испорчен
+
+    Принимает:
+        token: str - токен, полученный из encode_cursor
+
+    Возвращает:
+        tuple[date, int]
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        date, pk = raw.split("|")
+        return datetime.date.fromisoformat(date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError("Invalid cursor")
+
+
+def encode_search_cursor(rank: float, pk: int) -> str:
+    """
+    Кодирует позицию последней записи страницы поиска (релевантность, id) в непрозрачный токен
+
+    Принимает:
+        rank: float - релевантность последней записи страницы
+        pk: int - ID последней записи страницы
+
+    Возвращает:
+        str - токен для параметра cursor
+    """
+    raw = f"{rank!r}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(token: str) -> tuple[float, int]:
+    """
+    Декодирует токен cursor страницы поиска обратно в пару (релевантность, id)
+    или выкидывает ошибку ValidationError, если токен испорчен
+
+    Принимает:
+        token: str - токен, полученный из encode_search_cursor
+
+    Возвращает:
+        tuple[float, int]
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        rank, pk = raw.split("|")
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError("Invalid cursor")
+
+
+def get_page_size(value=None) -> int:
+    """
+    Возвращает размер страницы, ограниченный RECORDS_MAX_PAGE_SIZE
+    или выкидывает ошибку ValidationError, если значение не является положительным числом
+
+    Принимает:
+        value (str | int, optional): Запрошенный размер страницы.
+            По умолчанию - RECORDS_PAGE_SIZE.
+
+    Возвращает:
+        int
+    """
+    if value is None:
+        return settings.RECORDS_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError("Invalid page_size")
+    if page_size < 1:
+        raise ValidationError("Invalid page_size")
+    return min(page_size, settings.RECORDS_MAX_PAGE_SIZE)
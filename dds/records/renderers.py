@@ -0,0 +1,47 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    return JSONEncoder().default(obj)
+
+
+def dumps(data) -> bytes:
+    """
+    Сериализует данные в компактный JSON в UTF-8
+
+    Использует orjson, если он установлен, иначе стандартный json
+    с кодировщиком DRF. Даты, Decimal и ленивые строки Django
+    поддерживаются в обоих случаях.
+
+    Принимает:
+        data: Any - данные ответа
+
+    Возвращает:
+        bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer для больших ответов со списками записей
+
+    Рендерит через dumps (orjson, если доступен). Запросы с отступами
+    (Accept: application/json; indent=4) отдаются штатному JSONRenderer.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,79 @@
+import contextlib
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Состояние текущего запроса: {"pinned": читать с основного сервера, "written": были изменения}
+_primary_state = contextvars.ContextVar("records_primary_state", default=None)
+
+
+@contextlib.contextmanager
+def primary_pinning(pinned: bool = False):
+    """
+    Отслеживает изменения данных в пределах одного запроса
+
+    Принимает:
+        pinned: bool - с самого начала читать с основного сервера
+            (клиент недавно изменял данные)
+
+    Возвращает:
+        dict - состояние; "written" станет True после первой записи
+    """
+    state = {"pinned": pinned, "written": False}
+    token = _primary_state.set(state)
+    try:
+        yield state
+    finally:
+        _primary_state.reset(token)
+
+
+def pin_to_primary():
+    """
+    Отмечает, что текущий запрос изменил данные: его дальнейшие чтения
+    идут на основной сервер, а клиент получает метку для следующих запросов
+    """
+    state = _primary_state.get()
+    if state is not None:
+        state["pinned"] = state["written"] = True
+
+
+class PrimaryReplicaRouter:
+    """
+    Отправляет чтения моделей приложения records на реплику RECORDS_REPLICA_DATABASE,
+    а запись - на основной сервер
+
+    Модели других приложений (сессии, пользователи, админка) и очередь фоновых задач
+    роутер не трогает: их чтения идут в базу по умолчанию, чтобы не отставать
+    от только что сохраненных данных.
+    С основного сервера читаются:
+    - запросы внутри транзакции основного сервера (например, select_for_update в сервисах);
+    - запросы клиента, который изменял данные в этом или недавнем запросе
+      (см. primary_pinning и PrimaryStickinessMiddleware).
+    Любая запись модели records закрепляет запрос за основным сервером.
+    """
+    app_label = "records"
+    # Модели records, которые всегда читаются с основного сервера
+    primary_models = {"job"}
+
+    def db_for_read(self, model, **hints):
+        replica = settings.RECORDS_REPLICA_DATABASE
+        if (replica is None or model._meta.app_label != self.app_label
+                or model._meta.model_name in self.primary_models):
+            return None
+        state = _primary_state.get()
+        if (state and state["pinned"]) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == self.app_label:
+            pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит с репликацией основного сервера
+        return db != settings.RECORDS_REPLICA_DATABASE
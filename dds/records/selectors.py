@@ -1,45 +1,281 @@
 import datetime
+import re
+import time
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
-from django.db.models import QuerySet
+from django.db import connections, router
+from django.db.models import QuerySet, Q, F, Sum, Count
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear
 from django.db.models.sql import Query
 from rest_framework.generics import get_object_or_404
 
-from records.models import Records, Status, Type, Category, Subcategory
+from records import clock
+from records.executor import run_in_db_thread
+from records.models import (Records, Status, Type, Category, Subcategory, DailyTotals, TableVersion, RecordChange,
+                            Job)
+from records.pagination import (decode_cursor, encode_cursor, decode_search_cursor, encode_search_cursor,
+                                get_page_size)
+
+REFERENCE_DATA_CACHE_KEY = "records:reference-data"
+
+_reference_data = None
+
+
+REFERENCE_TREE_TABLE = "tree"
+
+
+class ReferenceData:
+    """
+    Снимок справочника (статусы, типы, категории, подкатегории) в памяти
+
+    Элементы хранятся как экземпляры моделей без связанных объектов:
+    для проверки иерархии используются category.type_id и subcategory.category_id,
+    поэтому работа со снимком не обращается к базе.
+    Вместе со снимком один раз строится дерево Тип -> Категория -> Подкатегория.
+    """
+    models = {"status": Status, "type": Type, "category": Category, "subcategory": Subcategory}
+
+    def __init__(self, items: dict[str, list], tree_version: int = 0, versions: dict[str, int] = None):
+        self.loaded_at = time.monotonic()
+        self.tree_version = tree_version
+        # Версии таблиц справочника (TableVersion) на момент чтения: {"status": 3, ...}
+        self.versions = versions or {}
+        self.by_id = {field: {obj.pk: obj for obj in objs} for field, objs in items.items()}
+        self.by_title = {field: {obj.title: obj for obj in objs} for field, objs in items.items()}
+        # Дочерние элементы по ID родителя: {"type": {type_id: [Category]}, "category": {category_id: [Subcategory]}}
+        self.children = {"type": {}, "category": {}}
+        for obj in items["category"]:
+            self.children["type"].setdefault(obj.type_id, []).append(obj)
+        for obj in items["subcategory"]:
+            self.children["category"].setdefault(obj.category_id, []).append(obj)
+        self.tree = [
+            {"id": type.pk, "title": type.title, "categories": [
+                {"id": category.pk, "title": category.title, "subcategories": [
+                    {"id": subcategory.pk, "title": subcategory.title}
+                    for subcategory in self.children["category"].get(category.pk, [])
+                ]}
+                for category in self.children["type"].get(type.pk, [])
+            ]}
+            for type in items["type"]
+        ]
+
+    @classmethod
+    def load(cls) -> "ReferenceData":
+        """
+        Читает весь справочник из базы (по одному запросу на сущность)
+
+        Версии дерева и таблиц читаются первыми: если справочник изменится во время
+        чтения, снимок будет считаться устаревшим (см. get_reference_tree, get_dictionary_item).
+        """
+        versions = dict(TableVersion.objects.filter(name__in=[REFERENCE_TREE_TABLE, *cls.models])
+                        .values_list("name", "version"))
+        items = {field: list(model.objects.order_by("pk")) for field, model in cls.models.items()}
+        return cls(items, versions.pop(REFERENCE_TREE_TABLE, 0), versions)
+
+
+def get_reference_data(refresh: bool = False) -> ReferenceData:
+    """
+    Возвращает закэшированный снимок справочника
+
+    Если в RECORDS_REFERENCE_CACHE указан alias из CACHES, снимок хранится
+    в общем кэше Django и виден всем воркерам. Иначе он хранится в памяти процесса
+    не дольше RECORDS_REFERENCE_CACHE_TIMEOUT секунд.
+    Кэш сбрасывается сигналами и ViewSet-ами справочника через invalidate_reference_data.
+
+    Принимает:
+        refresh: bool - перечитать справочник из базы
+
+    Возвращает:
+        ReferenceData
+    """
+    global _reference_data
+    alias = settings.RECORDS_REFERENCE_CACHE
+    if alias:
+        cache = caches[alias]
+        reference = None if refresh else cache.get(REFERENCE_DATA_CACHE_KEY)
+        if reference is None:
+            reference = ReferenceData.load()
+            cache.set(REFERENCE_DATA_CACHE_KEY, reference, timeout=settings.RECORDS_REFERENCE_CACHE_TIMEOUT)
+        return reference
+
+    reference = _reference_data
+    if (refresh or reference is None
+            or time.monotonic() - reference.loaded_at > settings.RECORDS_REFERENCE_CACHE_TIMEOUT):
+        reference = _reference_data = ReferenceData.load()
+    return reference
+
+
+def get_reference_tree(version: int = None) -> list[dict]:
+    """
+    Возвращает закэшированное дерево справочника Тип -> Категория -> Подкатегория
+
+    Дерево строится один раз вместе со снимком справочника и сбрасывается
+    сигналами при изменении типов, категорий и подкатегорий. Если передана
+    версия дерева (TableVersion "tree") и она не совпадает с версией снимка -
+    например, справочник изменил другой процесс, - снимок перечитывается.
+
+    Принимает:
+        version (int, optional): Текущая версия дерева
+
+    Возвращает:
+        list[dict] - [{"id", "title", "categories": [{"id", "title", "subcategories": [{"id", "title"}]}]}]
+    """
+    return _get_current_reference_data(version).tree
+
+
+def get_reference_children(parent: str, pk: int, version: int = None) -> list[dict]:
+    """
+    Возвращает дочерние элементы справочника из закэшированного дерева:
+    категории типа операции или подкатегории категории
+    или выкидывает ошибку ValidationError, если родитель не "type" и не "category"
+
+    Принимает:
+        parent: str - "type" или "category"
+        pk: int - ID родителя
+        version (int, optional): Текущая версия дерева (см. get_reference_tree)
+
+    Возвращает:
+        list[dict] - [{"id", "title"}], пустой список для неизвестного родителя
+    """
+    reference = _get_current_reference_data(version)
+    if parent not in reference.children:
+        raise ValidationError(f"Invalid parent: {parent}")
+    return [{"id": item.pk, "title": item.title} for item in reference.children[parent].get(pk, [])]
+
+
+def _get_current_reference_data(version: int = None) -> ReferenceData:
+    reference = get_reference_data()
+    if version is not None and reference.tree_version != version:
+        reference = get_reference_data(refresh=True)
+    return reference
+
+
+def invalidate_reference_data():
+    """
+    Сбрасывает закэшированный снимок справочника (локальный и общий)
+    """
+    global _reference_data
+    _reference_data = None
+    alias = settings.RECORDS_REFERENCE_CACHE
+    if alias:
+        caches[alias].delete(REFERENCE_DATA_CACHE_KEY)
+
+
+def get_dictionary_item(field: str, title: str = None, pk: int = None):
+    """
+    Возвращает элемент справочника по названию или ID из закэшированного снимка
+    или выкидывает ошибку ValidationError, если значение не найдено
+
+    При промахе сверяется версия таблицы в TableVersion (один запрос): элемент мог
+    быть создан другим процессом, который не сбросил локальный кэш этого процесса.
+    Снимок перечитывается, только если таблица менялась после его чтения,
+    поэтому запросы с несуществующими названиями не перечитывают весь справочник.
+
+    Принимает:
+        field: str - "status", "type", "category" или "subcategory"
+        title (str, optional): Название элемента
+        pk (int, optional): ID элемента (используется, если title не указан)
+
+    Возвращает:
+        Status | Type | Category | Subcategory
+    """
+    index, key = ("by_title", title) if title is not None else ("by_id", pk)
+    reference = get_reference_data()
+    item = getattr(reference, index)[field].get(key)
+    if item is None and get_table_version(field)[0] != reference.versions.get(field, 0):
+        item = getattr(get_reference_data(refresh=True), index)[field].get(key)
+    if item is None:
+        raise ValidationError(f"{ReferenceData.models[field].__name__} does not exist")
+    return item
+
 
 def get_filtered_records(
         date_from=None,
-        date_to=datetime.date.today(),
+        date_to=None,
         status=None,
         type=None,
         category=None,
-        subcategory=None
+        subcategory=None,
+        status_id=None,
+        type_id=None,
+        category_id=None,
+        subcategory_id=None,
 ) -> QuerySet[Records]:
     """
     Возвращает отфильтрованный QuerySet записей по параметрам
 
+    Фильтры по названиям переводятся в ID через закэшированный справочник,
+    поэтому в SQL попадают только условия по столбцам records_records без JOIN.
+
     Принимает:
         date_from (date, optional)
             Если не указана, фильтрация будет по условию (<= date_to).
-        date_to (date)
-            По умолчанию - текущая дата.
+        date_to (date, optional)
+            По умолчанию - текущая дата по часам приложения (records.clock).
         status (str, optional): Фильтр по названию статуса.
         type (str, optional): Фильтр по названию типа.
         category (str, optional): Фильтр по названию категории.
         subcategory (str, optional): Фильтр по названию подкатегории.
+        status_id (int, optional): Фильтр по ID статуса.
+        type_id (int, optional): Фильтр по ID типа.
+        category_id (int, optional): Фильтр по ID категории.
+        subcategory_id (int, optional): Фильтр по ID подкатегории.
 
     Возвращает:
         QuerySet[Records]
     """
-    query = Records.objects.all()
-    if type:
-        query = query.filter(type__title=type)
-    if category:
-        query = query.filter(category__title=category)
-    if subcategory:
-        query = query.filter(subcategory__title=subcategory)
-    if status:
-        query = query.filter(status__title=status)
+    return _apply_filters(
+        Records.objects.all(), date_from, date_to, status, type, category, subcategory,
+        status_id, type_id, category_id, subcategory_id,
+    )
+
+
+def get_filtered_daily_totals(**filters) -> QuerySet[DailyTotals]:
+    """
+    Возвращает отфильтрованный QuerySet сумм за день (DailyTotals)
+
+    Принимает те же параметры, что и get_filtered_records.
+    Все фильтры записей относятся к полям ключа DailyTotals,
+    поэтому суммы по отфильтрованным сводкам совпадают с суммами по записям.
+
+    Возвращает:
+        QuerySet[DailyTotals]
+    """
+    return _apply_filters(DailyTotals.objects.all(), **filters)
+
+
+def _apply_filters(
+        query,
+        date_from=None,
+        date_to=None,
+        status=None,
+        type=None,
+        category=None,
+        subcategory=None,
+        status_id=None,
+        type_id=None,
+        category_id=None,
+        subcategory_id=None,
+):
+    for field, title, pk in (
+            ("type", type, type_id),
+            ("category", category, category_id),
+            ("subcategory", subcategory, subcategory_id),
+            ("status", status, status_id),
+    ):
+        if title:
+            try:
+                item = get_dictionary_item(field, title)
+            except ValidationError:
+                return query.none()
+            query = query.filter(**{f"{field}_id": item.pk})
+        if pk:
+            query = query.filter(**{f"{field}_id": pk})
+    if date_to is None:
+        date_to = clock.today()
     if date_from is None:
         query = query.filter(date__lte=date_to)
     else:
@@ -47,11 +283,370 @@ def get_filtered_records(
     return query
 
 
+RECORD_ROW_FIELDS = ("pk", "date", "status", "type", "category", "subcategory", "amount", "comment", "version")
+RECORD_ROW_COLUMNS = ("pk", "date", "status__title", "type__title", "category__title", "subcategory__title",
+                      "amount", "comment", "version")
+
+
+def get_records_rows(query: QuerySet[Records]) -> list[tuple]:
+    """
+    Возвращает записи в виде кортежей с названиями элементов справочника
+
+    Названия статуса, типа, категории и подкатегории забираются одним
+    запросом с JOIN, поэтому количество запросов не зависит от числа записей.
+
+    Принимает:
+        query: QuerySet[Records] - например, результат get_filtered_records
+
+    Возвращает:
+        list[tuple] - значения в порядке RECORD_ROW_FIELDS
+    """
+    return list(query.values_list(*RECORD_ROW_COLUMNS))
+
+
+def iter_records_rows(query: QuerySet[Records], chunk_size: int = None):
+    """
+    Возвращает итератор по записям в виде кортежей, отсортированных по (date, id)
+
+    Строки читаются из курсора пачками по chunk_size, поэтому потребление памяти
+    не зависит от количества записей в выборке.
+
+    Принимает:
+        query: QuerySet[Records] - например, результат get_filtered_records
+        chunk_size (int, optional): Размер пачки. По умолчанию - RECORDS_EXPORT_CHUNK_SIZE.
+
+    Возвращает:
+        Iterator[tuple] - значения в порядке RECORD_ROW_FIELDS
+    """
+    return (query.order_by("date", "pk")
+            .values_list(*RECORD_ROW_COLUMNS)
+            .iterator(chunk_size=chunk_size or settings.RECORDS_EXPORT_CHUNK_SIZE))
+
+
+async def aiter_records_rows(query: QuerySet[Records], chunk_size: int = None):
+    """
+    Асинхронный вариант iter_records_rows
+
+    Строки читаются пачками iter_records_row_pages, каждая пачка - отдельным
+    вызовом в общем пуле run_in_db_thread. Пока медленный клиент принимает
+    пачку, курсор и соединение с базой не заняты, а число соединений выгрузки
+    ограничено размером пула: пачки одновременных выгрузок читаются по очереди.
+
+    Возвращает:
+        AsyncIterator[tuple] - значения в порядке RECORD_ROW_FIELDS
+    """
+    pages = iter_records_row_pages(query, chunk_size)
+    while True:
+        page = await run_in_db_thread(next, pages, None)
+        if page is None:
+            return
+        for row in page:
+            yield row
+
+
+def iter_records_row_pages(query: QuerySet[Records], page_size: int = None):
+    """
+    Возвращает итератор по пачкам записей, отсортированных по (date, id)
+
+    Каждая пачка читается отдельным запросом по ключу (date, id) последней
+    строки предыдущей пачки. В отличие от iter_records_rows, между пачками
+    курсор не остается открытым, поэтому в промежутках можно писать в базу:
+    на SQLite запись при незавершенном чтении на том же соединении
+    может завершиться ошибкой "database is locked".
+
+    Принимает:
+        query: QuerySet[Records] - например, результат get_filtered_records
+        page_size (int, optional): Размер пачки. По умолчанию - RECORDS_EXPORT_CHUNK_SIZE.
+
+    Возвращает:
+        Iterator[list[tuple]] - пачки строк в порядке RECORD_ROW_FIELDS
+    """
+    page_size = page_size or settings.RECORDS_EXPORT_CHUNK_SIZE
+    query = query.order_by("date", "pk")
+    page = query
+    while True:
+        rows = get_records_rows(page[:page_size])
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        pk, date = rows[-1][0], rows[-1][1]
+        page = query.filter(Q(date__gt=date) | Q(date=date, pk__gt=pk))
+
+
+def get_records_page(query: QuerySet[Records], cursor: str = None, page_size: int = None) -> tuple[list[tuple], str]:
+    """
+    Возвращает одну страницу записей, отсортированных от новых к старым по (date, id)
+
+    Пагинация курсорная: следующая страница начинается строго после
+    последней записи предыдущей, без OFFSET. Новые записи попадают в начало
+    выборки и не сдвигают уже выданные страницы.
+    Результат search_records сортируется по релевантности, затем по id.
+
+    Принимает:
+        query: QuerySet[Records] - например, результат get_filtered_records
+        cursor (str, optional): Токен next с предыдущей страницы
+        page_size (int, optional): Количество записей на странице.
+            По умолчанию - RECORDS_PAGE_SIZE.
+
+    Возвращает:
+        tuple[list[tuple], str] - строки страницы и токен следующей страницы
+        (None, если страница последняя)
+    """
+    if page_size is None:
+        page_size = get_page_size()
+    return _split_page(list(_page_query(query, cursor, page_size)), page_size)
+
+
+async def aget_records_page(query: QuerySet[Records], cursor: str = None,
+                            page_size: int = None) -> tuple[list[tuple], str]:
+    """
+    Асинхронный вариант get_records_page
+    """
+    if page_size is None:
+        page_size = get_page_size()
+    rows = [row async for row in _page_query(query, cursor, page_size)]
+    return _split_page(rows, page_size)
+
+
+def _page_query(query: QuerySet[Records], cursor: str, page_size: int) -> QuerySet:
+    if "search_rank" in query.query.annotations:
+        # Релевантность - последний столбец строки, _split_page его отрезает
+        if cursor:
+            rank, pk = decode_search_cursor(cursor)
+            query = query.filter(Q(search_rank__gt=rank) | Q(search_rank=rank, pk__gt=pk))
+        return query.order_by("search_rank", "pk").values_list(*RECORD_ROW_COLUMNS, "search_rank")[:page_size + 1]
+    if cursor:
+        date, pk = decode_cursor(cursor)
+        query = query.filter(Q(date__lt=date) | Q(date=date, pk__lt=pk))
+    return query.order_by("-date", "-pk").values_list(*RECORD_ROW_COLUMNS)[:page_size + 1]
+
+
+def _split_page(rows: list[tuple], page_size: int) -> tuple[list[tuple], str]:
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        if len(last) > len(RECORD_ROW_COLUMNS):
+            next_cursor = encode_search_cursor(last[-1], last[0])
+        else:
+            next_cursor = encode_cursor(last[1], last[0])
+    if rows and len(rows[0]) > len(RECORD_ROW_COLUMNS):
+        rows = [row[:-1] for row in rows]
+    return rows, next_cursor
+
+
+SEARCH_WORD_RE = re.compile(r"\w+")
+
+
+def search_records(query: QuerySet[Records], q: str) -> QuerySet[Records]:
+    """
+    Оставляет записи, в комментарии которых есть все слова q,
+    и добавляет релевантность search_rank (меньше - релевантнее)
+
+    Каждое слово ищется как префикс ("авит" находит "Авито"), без учета регистра.
+    Поиск идет по инвертированному индексу, а не LIKE '%...%' по всей таблице:
+    на SQLite - FTS5 records_records_fts (bm25), на PostgreSQL - GIN-индекс
+    по to_tsvector('simple', comment) (ts_rank). Индексы создаются миграцией 0010.
+    Выкидывает ошибку ValidationError, если в q нет ни одного слова.
+
+    Принимает:
+        query: QuerySet[Records] - например, результат get_filtered_records
+        q: str - поисковая строка
+
+    Возвращает:
+        QuerySet[Records]
+    """
+    words = SEARCH_WORD_RE.findall(q)
+    if not words:
+        raise ValidationError("Invalid q")
+    if connections[query.db].vendor == "postgresql":
+        # django.contrib.postgres нужен только на PostgreSQL (psycopg)
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector("comment", config="simple")
+        search = SearchQuery(" & ".join(f"{word}:*" for word in words), config="simple", search_type="raw")
+        return (query.annotate(search_vector=vector, search_rank=-SearchRank(vector, search))
+                .filter(search_vector=search))
+    match = " ".join(f'"{word}"*' for word in words)
+    return query.filter(search__comment__match=match).annotate(search_rank=F("search__rank"))
+
+
+DAILY_TOTALS_KEY = ("date", "status_id", "type_id", "category_id", "subcategory_id")
+REPORT_PERIODS = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth, "year": TruncYear}
+REPORT_DIMENSIONS = ("type", "status", "category", "subcategory")
+
+
+def get_records_report(query: QuerySet[Records], period: str = None, group_by=()) -> dict:
+    """
+    Возвращает суммы и количество записей, сгруппированные базой данных
+
+    Отчет строится как по записям, так и по суммам за день
+    (результат get_filtered_daily_totals): в ключ DailyTotals входят дата и все
+    элементы справочника, поэтому любая группировка из REPORT_PERIODS и
+    REPORT_DIMENSIONS выводится из сводки.
+    Группировка выполняется по ID элементов справочника, названия подставляются
+    из закэшированного справочника, поэтому запрос обходится без JOIN.
+    Результат отдается по столбцам: по одному списку на каждое поле.
+    При неизвестном периоде или поле группировки выкидывает ошибку ValidationError
+
+    Принимает:
+        query: QuerySet[Records] | QuerySet[DailyTotals] - результат get_filtered_records
+            или get_filtered_daily_totals
+        period (str, optional): "day", "week", "month" или "year"
+        group_by (Iterable[str]): Поля из REPORT_DIMENSIONS
+
+    Возвращает:
+        dict - {"period": [...], "type": [...], ..., "total": [...], "count": [...]}
+    """
+    if period is not None and period not in REPORT_PERIODS:
+        raise ValidationError("Unknown report period")
+    group_by = list(group_by)
+    if any(field not in REPORT_DIMENSIONS for field in group_by) or len(set(group_by)) != len(group_by):
+        raise ValidationError("Unknown report grouping")
+
+    keys = [f"{field}_id" for field in group_by]
+    if period:
+        query = query.annotate(period=REPORT_PERIODS[period]("date"))
+        keys.insert(0, "period")
+    if query.model is DailyTotals:
+        totals = {"total": Sum("amount"), "count": Sum("records_count")}
+    else:
+        totals = {"total": Sum("amount"), "count": Count("pk")}
+    if keys:
+        rows = query.values_list(*keys).annotate(**totals).order_by(*keys)
+    else:
+        aggregate = query.aggregate(**totals)
+        rows = [(aggregate["total"] or 0, aggregate["count"] or 0)]
+
+    names = (["period"] if period else []) + group_by + ["total", "count"]
+    report = {name: [] for name in names}
+    for row in rows:
+        for name, value in zip(names, row):
+            if name in REPORT_DIMENSIONS:
+                value = get_dictionary_item(name, pk=value).title
+            report[name].append(value)
+    return report
+
+
+def get_records_count_estimate() -> int:
+    """
+    Оценивает количество всех записей без COUNT(*) по таблице записей
+
+    На PostgreSQL берется статистика планировщика (pg_class.reltuples),
+    иначе - сумма records_count по DailyTotals: она совпадает с количеством
+    записей, а строк в сводке на порядки меньше.
+
+    Возвращает:
+        int
+    """
+    connection = connections[router.db_for_read(Records)]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [Records._meta.db_table])
+            row = cursor.fetchone()
+        # -1 или 0, пока таблицу не анализировали
+        if row and row[0] > 0:
+            return row[0]
+    return DailyTotals.objects.aggregate(count=Sum("records_count"))["count"] or 0
+
+
+def get_daily_totals_mismatches() -> list[dict]:
+    """
+    Сверяет DailyTotals с суммами, посчитанными по таблице записей
+
+    Возвращает:
+        list[dict] - расхождения: ключ строки, значения по записям (expected)
+        и в сводке (actual); пустой список, если сводка верна
+    """
+    expected = {
+        tuple(row[:-2]): tuple(row[-2:])
+        for row in Records.objects.values_list(*DAILY_TOTALS_KEY).annotate(total=Sum("amount"), count=Count("pk")).order_by()
+    }
+    actual = {
+        tuple(row[:-2]): tuple(row[-2:])
+        for row in DailyTotals.objects.values_list(*DAILY_TOTALS_KEY, "amount", "records_count")
+    }
+    return [
+        {"key": dict(zip(DAILY_TOTALS_KEY, bucket)), "expected": expected.get(bucket), "actual": actual.get(bucket)}
+        for bucket in sorted(expected.keys() | actual.keys())
+        if expected.get(bucket) != actual.get(bucket)
+    ]
+
+
+def get_table_version(name: str) -> tuple[int, datetime.datetime]:
+    """
+    Возвращает счетчик изменений таблицы и время последнего изменения
+
+    Принимает:
+        name: str - имя таблицы, например "records"
+
+    Возвращает:
+        tuple[int, datetime] - (0, None), если таблица еще не менялась
+    """
+    row = TableVersion.objects.filter(name=name).values_list("version", "updated_at").first()
+    return row or (0, None)
+
+
+async def aget_table_version(name: str) -> tuple[int, datetime.datetime]:
+    """
+    Асинхронный вариант get_table_version
+    """
+    row = await TableVersion.objects.filter(name=name).values_list("version", "updated_at").afirst()
+    return row or (0, None)
+
+
+def get_record_changes(since: int = 0, limit: int = None) -> dict:
+    """
+    Возвращает изменения записей после токена синхронизации since
+
+    Читает не больше limit строк журнала RecordChange, поэтому объем ответа
+    пропорционален числу изменений, а не размеру таблицы записей.
+    Изменение, зафиксированное после ответа, всегда получает ID больше next
+    (журнал пишется по очереди, см. log_record_changes), поэтому клиент
+    не пропускает изменения, продолжая с next.
+    Для измененных записей отдается их текущее состояние, для удаленных - ID.
+
+    Принимает:
+        since: int - ID последней полученной строки журнала (0 - с самого начала)
+        limit (int, optional): Количество строк журнала. По умолчанию - RECORDS_PAGE_SIZE.
+
+    Возвращает:
+        dict - {"records": [...], "deleted": [...], "next": int, "has_more": bool}
+    """
+    if limit is None:
+        limit = get_page_size()
+    changes = list(
+        RecordChange.objects.filter(pk__gt=since).order_by("pk")
+        .values_list("pk", "record_id", "action")[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    latest = {}
+    for _, record_id, action in changes:
+        latest[record_id] = action
+    upserted = [pk for pk, action in latest.items() if action == RecordChange.UPSERT]
+    rows = get_records_rows(Records.objects.filter(pk__in=upserted).order_by("pk"))
+    found = {row[0] for row in rows}
+    deleted = sorted(pk for pk, action in latest.items() if action == RecordChange.DELETE or pk not in found)
+    return {
+        "records": rows,
+        "deleted": deleted,
+        "next": changes[-1][0] if changes else since,
+        "has_more": has_more,
+    }
+
+
 def get_record_by_id(pk: int) -> Records:
     """
     Возвращает запись по ID
     или выкидывает ошибку ValidationError, если значение не найдено
 
+    Запись читается по первичному ключу без JOIN, элементы справочника
+    подставляются из закэшированного снимка.
+
     Принимает:
         pk: int - первичный ключ
 
@@ -59,9 +654,33 @@ def get_record_by_id(pk: int) -> Records:
         Records
     """
     try:
-        return Records.objects.get(pk=pk)
+        record = Records.objects.get(pk=pk)
+    except Records.DoesNotExist:
+        raise ValidationError("Record does not exist")
+    return attach_dictionary_items(record)
+
+
+async def aget_record_by_id(pk: int) -> Records:
+    """
+    Асинхронный вариант get_record_by_id
+    """
+    try:
+        record = await Records.objects.aget(pk=pk)
     except Records.DoesNotExist:
         raise ValidationError("Record does not exist")
+    # Снимок справочника обычно уже в кэше, но при промахе читается из базы
+    return await sync_to_async(attach_dictionary_items)(record)
+
+
+def attach_dictionary_items(record: Records) -> Records:
+    """
+    Подставляет в запись элементы справочника из закэшированного снимка
+    вместо отдельных запросов при обращении к record.type и т.п.
+    """
+    for field in REPORT_DIMENSIONS:
+        setattr(record, field, get_dictionary_item(field, pk=getattr(record, f"{field}_id")))
+    return record
+
 
 def get_type(title: str) -> Type:
     """
@@ -74,10 +693,7 @@ def get_type(title: str) -> Type:
         Возвращает:
             Type
     """
-    try:
-        return Type.objects.get(title=title)
-    except Type.DoesNotExist:
-        raise ValidationError("Type does not exist")
+    return get_dictionary_item("type", title)
 
 def get_status(title: str) -> Status:
     """
@@ -90,10 +706,7 @@ def get_status(title: str) -> Status:
         Возвращает:
             Status
     """
-    try:
-        return Status.objects.get(title=title)
-    except Status.DoesNotExist:
-        raise ValidationError("Status does not exist")
+    return get_dictionary_item("status", title)
 
 def get_category(title: str) -> Category:
     """
@@ -106,10 +719,7 @@ def get_category(title: str) -> Category:
         Возвращает:
             Category
     """
-    try:
-        return Category.objects.get(title=title)
-    except Category.DoesNotExist:
-        raise ValidationError("Category does not exist")
+    return get_dictionary_item("category", title)
 
 def get_subcategory(title: str) -> Subcategory:
     """
@@ -122,10 +732,7 @@ def get_subcategory(title: str) -> Subcategory:
         Возвращает:
             Subcategory
     """
-    try:
-        return Subcategory.objects.get(title=title)
-    except Subcategory.DoesNotExist:
-        raise ValidationError("Subcategory does not exist")
+    return get_dictionary_item("subcategory", title)
 
 def get_category_by_type(type_id: int) -> Category:
     """
@@ -157,4 +764,34 @@ def get_subcategory_by_category(category_id: int):
     try:
         return Subcategory.objects.get(category_id=category_id)
     except Subcategory.DoesNotExist:
-        raise ValidationError("Subcategory does not exist")
\ No newline at end of file
+        raise ValidationError("Subcategory does not exist")
+
+def get_job_by_id(pk: int) -> Job:
+    """
+    Возвращает фоновую задачу по ID
+    или выкидывает ошибку ValidationError, если задача не найдена
+
+    Принимает:
+        pk: int - первичный ключ
+
+    Возвращает:
+        Job
+    """
+    try:
+        return Job.objects.get(pk=pk)
+    except Job.DoesNotExist:
+        raise ValidationError("Job does not exist")
+
+
+def get_queued_job_ids(limit: int) -> list[int]:
+    """
+    Возвращает ID самых старых задач в очереди
+
+    Принимает:
+        limit: int - сколько задач вернуть
+
+    Возвращает:
+        list[int]
+    """
+    return list(Job.objects.filter(status=Job.QUEUED)
+                .order_by("created_at", "pk").values_list("pk", flat=True)[:limit])
@@ -1,6 +1,10 @@
+from django.urls import reverse
 from rest_framework import serializers
 
-from records.models import Type, Status, Category, Subcategory
+from records.models import Type, Status, Category, Subcategory, Job
+from records.selectors import RECORD_ROW_FIELDS
+
+RECORD_FIELDS = ("id",) + RECORD_ROW_FIELDS[1:]
 
 
 class RecordsSerializer(serializers.Serializer):
@@ -16,6 +20,8 @@ class RecordsSerializer(serializers.Serializer):
         subcategory (str): Подкатегория операции.
         amount (int): Сумма операции (должна быть положительной).
         comment (str, optional): Дополнительный комментарий к операции.
+        version (int, optional): Версия записи. При обновлении - версия, которую видел
+            клиент; если запись успели изменить, обновление отклоняется.
     """
     id = serializers.IntegerField(source="pk", read_only=True)
     date =  serializers.DateField(read_only=True)
@@ -25,6 +31,24 @@ class RecordsSerializer(serializers.Serializer):
     subcategory = serializers.CharField()
     amount = serializers.IntegerField(min_value=1)
     comment = serializers.CharField(required=False, allow_blank=True)
+    version = serializers.IntegerField(required=False, min_value=1)
+
+
+def serialize_record_rows(rows) -> list[dict]:
+    """
+    Быстрая сериализация записей только для чтения
+
+    Вместо обхода полей RecordsSerializer строка values_list превращается
+    в словарь одним zip. Дата остается объектом date и форматируется
+    рендерером, вывод совпадает с RecordsSerializer.
+
+    Принимает:
+        rows: Iterable[tuple] - строки в порядке RECORD_ROW_FIELDS
+
+    Возвращает:
+        list[dict] - ключи из RECORD_FIELDS
+    """
+    return [dict(zip(RECORD_FIELDS, row)) for row in rows]
 
 
 class StatusSerializer(serializers.ModelSerializer):
@@ -61,3 +85,23 @@ class SubcategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Subcategory
         fields = '__all__'
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор фоновой задачи
+
+    Поля модели Job, кроме параметров и имени файла, и result_url -
+    ссылка на файл результата, когда он готов.
+    """
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ("id", "kind", "status", "processed", "total", "result", "error",
+                  "created_at", "started_at", "finished_at", "result_url")
+
+    def get_result_url(self, job) -> str:
+        if job.status != Job.DONE or not job.result_file:
+            return None
+        return reverse("jobs-result", kwargs={"pk": job.pk})
@@ -1,56 +1,183 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from django.db.models import F, Sum, Count
 
-from records.models import Records
-from records.selectors import get_status, get_type, get_subcategory, get_category
+from records import clock
+from records.models import Records, DailyTotals, TableVersion, RecordChange, Job
+from records.routers import pin_to_primary
+from records.selectors import (get_status, get_type, get_subcategory, get_category, get_dictionary_item,
+                               DAILY_TOTALS_KEY, REPORT_DIMENSIONS)
 
-def create_record(data: dict):
+def add_daily_totals_delta(deltas: dict, record: Records, sign: int):
     """
-    Создает новую запись операции с валидацией зависимостей сущностей
+    Добавляет вклад записи в изменения сумм за день
+
+    Принимает:
+        deltas: dict - накопитель {ключ DAILY_TOTALS_KEY: (сумма, количество)}
+        record (Records): Запись операции
+        sign: int - 1, если запись добавляется в сумму, -1 - если вычитается
+    """
+    key = tuple(getattr(record, field) for field in DAILY_TOTALS_KEY)
+    add_daily_totals_bucket_delta(deltas, key, sign * record.amount, sign)
+
+def add_daily_totals_bucket_delta(deltas: dict, key: tuple, amount: int, count: int):
+    """
+    Добавляет изменение суммы и количества записей одной строки DailyTotals
+
+    Принимает:
+        deltas: dict - накопитель {ключ DAILY_TOTALS_KEY: (сумма, количество)}
+        key: tuple - значения DAILY_TOTALS_KEY
+        amount: int - изменение суммы
+        count: int - изменение количества записей
+    """
+    total, records_count = deltas.get(key, (0, 0))
+    deltas[key] = (total + amount, records_count + count)
+
+def update_daily_totals(deltas: dict):
+    """
+    Применяет накопленные изменения к таблице DailyTotals
+
+    Каждая строка меняется одним UPDATE с F-выражениями, поэтому параллельные
+    изменения одной и той же строки не теряются. Строки без записей удаляются.
+    Вызывается внутри транзакции, изменяющей сами записи.
+
+    Принимает:
+        deltas: dict - {ключ DAILY_TOTALS_KEY: (сумма, количество)}
+    """
+    for key, (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        bucket = dict(zip(DAILY_TOTALS_KEY, key))
+        changes = {"amount": F("amount") + amount, "records_count": F("records_count") + count}
+        if not DailyTotals.objects.filter(**bucket).update(**changes):
+            try:
+                with transaction.atomic():
+                    DailyTotals.objects.create(**bucket, amount=amount, records_count=count)
+            except IntegrityError:
+                DailyTotals.objects.filter(**bucket).update(**changes)
+        if count < 0:
+            DailyTotals.objects.filter(**bucket, records_count__lte=0).delete()
+
+def bump_table_version(*names: str):
+    """
+    Увеличивает счетчики изменений таблиц (TableVersion)
+
+    Вызывается внутри транзакции, изменяющей таблицу, чтобы новая версия
+    стала видна одновременно с изменениями. Через нее проходит любая запись,
+    поэтому здесь же текущий запрос закрепляется за основным сервером.
+
+    Принимает:
+        names: str - имена таблиц, например "records"
+    """
+    pin_to_primary()
+    now = clock.now()
+    for name in names:
+        changes = {"version": F("version") + 1, "updated_at": now}
+        if not TableVersion.objects.filter(name=name).update(**changes):
+            _, created = TableVersion.objects.get_or_create(name=name, defaults={"version": 1, "updated_at": now})
+            if not created:
+                TableVersion.objects.filter(name=name).update(**changes)
+
+def log_record_changes(record_ids, action: str):
+    """
+    Пишет изменения записей в журнал RecordChange и увеличивает счетчик изменений "records"
+
+    ID журнала - токен синхронизации (см. get_record_changes), поэтому они
+    должны становиться видимыми в порядке выдачи. Счетчик увеличивается до
+    вставки: UPDATE строки TableVersion "records" держит блокировку до конца
+    транзакции, и следующая транзакция получает ID журнала только после
+    коммита предыдущей.
+
+    Принимает:
+        record_ids: Iterable[int] - ID измененных записей
+        action: str - RecordChange.UPSERT или RecordChange.DELETE
+    """
+    with transaction.atomic():
+        bump_table_version("records")
+        RecordChange.objects.bulk_create(
+            (RecordChange(record_id=pk, action=action) for pk in record_ids),
+            batch_size=settings.RECORDS_BULK_BATCH_SIZE,
+        )
+
+def after_records_changed(deltas: dict, record_ids, action: str):
+    """
+    Обновляет все производные данные после изменения записей:
+    суммы за день, счетчик изменений таблицы и журнал изменений
+
+    Вызывается внутри транзакции, изменяющей записи.
+
+    Принимает:
+        deltas: dict - изменения сумм (см. update_daily_totals)
+        record_ids: Iterable[int] - ID измененных записей
+        action: str - RecordChange.UPSERT или RecordChange.DELETE
+    """
+    update_daily_totals(deltas)
+    log_record_changes(record_ids, action)
+
+def rebuild_daily_totals(batch_size: int = None) -> int:
+    """
+    Пересобирает таблицу DailyTotals с нуля по таблице записей
+
+    Принимает:
+        batch_size (int, optional): Размер пачки INSERT.
+            По умолчанию - RECORDS_BULK_BATCH_SIZE.
+
+    Возвращает:
+        int - количество строк DailyTotals
+    """
+    rows = (Records.objects.values_list(*DAILY_TOTALS_KEY)
+            .annotate(total=Sum("amount"), count=Count("pk")).order_by())
+    with transaction.atomic():
+        DailyTotals.objects.all().delete()
+        created = DailyTotals.objects.bulk_create(
+            (DailyTotals(**dict(zip(DAILY_TOTALS_KEY, key)), amount=total, records_count=count)
+             for *key, total, count in rows.iterator()),
+            batch_size=batch_size or settings.RECORDS_BULK_BATCH_SIZE,
+        )
+    return len(created)
 
+def build_record(data: dict) -> Records:
+    """
+    Собирает несохраненную запись операции с валидацией зависимостей сущностей
+
+    Элементы справочника берутся из закэшированного снимка, поэтому проверка
+    не выполняет запросов к базе.
     При несовпадении зависимостей выкидывает ошибку ValidationError
 
     Принимает:
-        data: dict - словарь validated_data из сериализатора.
-        В себе должен хранить:
-            - status (str): Название статуса
-            - type (str): Название типа операции
-            - category (str): Название категории
-            - subcategory (str): Название подкатегории
-            - amount (int): Сумма операции
-            - comment (str, optional): Комментарий к операции
+        data: dict - словарь validated_data из сериализатора (см. create_record)
 
     Возвращает:
-        Records - созданный объект
+        Records - несохраненный объект
     """
     status = get_status(data.get("status"))
     type = get_type(data.get("type"))
     category = get_category(data.get("category"))
     subcategory = get_subcategory(data.get("subcategory"))
 
-    if category.type != type:
+    if category.type_id != type.pk:
         raise ValidationError("Категория не принадлежит выбранному типу операции")
 
-    if subcategory.category != category:
+    if subcategory.category_id != category.pk:
         raise ValidationError("Подкатегория не принадлежит выбранной категории")
 
-
-    return Records.objects.create(
+    return Records(
         status=status,
         type=type,
         category=category,
         subcategory=subcategory,
         amount=data["amount"],
-        comment=data["comment"]
+        comment=data.get("comment")
     )
 
-def update_record(instance: Records, data: dict):
+def create_record(data: dict):
     """
-    Обновляет существующую запись операции с валидацией зависимостей сущностей
+    Создает новую запись операции с валидацией зависимостей сущностей
 
     При несовпадении зависимостей выкидывает ошибку ValidationError
 
     Принимает:
-        instance (Records): Объект записи, который нужно обновить
         data: dict - словарь validated_data из сериализатора.
         В себе должен хранить:
             - status (str): Название статуса
@@ -63,26 +190,131 @@ def update_record(instance: Records, data: dict):
     Возвращает:
         Records - созданный объект
     """
-    status = get_status(data.get("status", instance.status))
-    type = get_type(data.get("type", instance.type))
-    category = get_category(data.get("category", instance.category))
-    subcategory = get_subcategory(data.get("subcategory", instance.subcategory))
+    record = build_record(data)
+    deltas = {}
+    with transaction.atomic():
+        record.save(force_insert=True)
+        add_daily_totals_delta(deltas, record, 1)
+        after_records_changed(deltas, [record.pk], RecordChange.UPSERT)
+    return record
 
-    if category.type != type:
-        raise ValidationError("Категория не принадлежит выбранному типу операции")
+def bulk_create_records(records: list[Records], batch_size: int = None) -> list[Records]:
+    """
+    Сохраняет заранее проверенные записи (см. build_record) пачками в одной транзакции
 
-    if subcategory.category != category:
-        raise ValidationError("Подкатегория не принадлежит выбранной категории")
+    Принимает:
+        records: list[Records] - несохраненные записи
+        batch_size (int, optional): Размер пачки INSERT.
+            По умолчанию - RECORDS_BULK_BATCH_SIZE.
 
-    instance.status = status
-    instance.type = type
-    instance.category = category
-    instance.subcategory = subcategory
-    instance.amount = data.get("amount", instance.amount)
-    instance.comment = data.get("comment", instance.comment)
-    instance.save()
+    Возвращает:
+        list[Records] - созданные объекты
+    """
+    deltas = {}
+    with transaction.atomic():
+        created = Records.objects.bulk_create(records, batch_size=batch_size or settings.RECORDS_BULK_BATCH_SIZE)
+        for record in created:
+            add_daily_totals_delta(deltas, record, 1)
+        after_records_changed(deltas, [record.pk for record in created], RecordChange.UPSERT)
+    return created
+
+class RecordVersionConflict(Exception):
+    """
+    Запись была изменена другим запросом после того, как ее прочитали
+    """
+    def __init__(self, message="Record was modified by another request"):
+        super().__init__(message)
+        self.message = message
+
+def update_record(instance: Records, data: dict, version: int = None):
+    """
+    Обновляет существующую запись операции с валидацией зависимостей сущностей
+
+    Из справочника ищутся только переданные элементы, иерархия проверяется
+    по ID из закэшированного снимка. В базу пишутся только изменившиеся поля
+    одним условным UPDATE по (id, version): если запись успели изменить
+    после чтения, выкидывает RecordVersionConflict и ничего не меняет.
+    При несовпадении зависимостей выкидывает ошибку ValidationError
+
+    Принимает:
+        instance (Records): Объект записи, который нужно обновить
+        data: dict - словарь validated_data из сериализатора.
+        Может хранить (при PATCH - любое подмножество):
+            - status (str): Название статуса
+            - type (str): Название типа операции
+            - category (str): Название категории
+            - subcategory (str): Название подкатегории
+            - amount (int): Сумма операции
+            - comment (str, optional): Комментарий к операции
+        version (int, optional): Версия записи, которую видел клиент.
+            По умолчанию - версия instance.
+
+    Возвращает:
+        Records - обновленный объект
+    """
+    if version is None:
+        version = instance.version
+    elif version != instance.version:
+        raise RecordVersionConflict()
+
+    changes = {}
+    for field in REPORT_DIMENSIONS:
+        if field in data:
+            item = get_dictionary_item(field, title=data[field])
+            if item.pk != getattr(instance, f"{field}_id"):
+                changes[field] = item
+    for field in ("amount", "comment"):
+        if field in data and data[field] != getattr(instance, field):
+            changes[field] = data[field]
+    if not changes:
+        return instance
+
+    if changes.keys() & {"type", "category", "subcategory"}:
+        type_id = changes["type"].pk if "type" in changes else instance.type_id
+        category = changes.get("category") or get_dictionary_item("category", pk=instance.category_id)
+        subcategory = changes.get("subcategory") or get_dictionary_item("subcategory", pk=instance.subcategory_id)
+
+        if category.type_id != type_id:
+            raise ValidationError("Категория не принадлежит выбранному типу операции")
+
+        if subcategory.category_id != category.pk:
+            raise ValidationError("Подкатегория не принадлежит выбранной категории")
+
+    deltas = {}
+    add_daily_totals_delta(deltas, instance, -1)
+    updated_at = clock.now()
+    with transaction.atomic():
+        updated = Records.objects.filter(pk=instance.pk, version=version).update(
+            **changes, updated_at=updated_at, version=F("version") + 1,
+        )
+        if not updated:
+            raise RecordVersionConflict()
+        for field, value in changes.items():
+            setattr(instance, field, value)
+        instance.updated_at = updated_at
+        instance.version = version + 1
+        add_daily_totals_delta(deltas, instance, 1)
+        after_records_changed(deltas, [instance.pk], RecordChange.UPSERT)
     return instance
 
+def save_record(instance: Records):
+    """
+    Сохраняет запись, измененную в обход update_record (например, формой админ-панели),
+    и пересчитывает DailyTotals по сохраненному в базе состоянию записи
+
+    Принимает:
+        instance (Records): Новая или измененная запись
+    """
+    deltas = {}
+    with transaction.atomic():
+        if instance.pk:
+            current = Records.objects.select_for_update().get(pk=instance.pk)
+            add_daily_totals_delta(deltas, current, -1)
+            instance.version = current.version + 1
+        instance.save()
+        add_daily_totals_delta(deltas, instance, 1)
+        after_records_changed(deltas, [instance.pk], RecordChange.UPSERT)
+
 def delete_record(instance: Records):
     """
     Удаляет существующую запись операции
@@ -92,5 +324,194 @@ def delete_record(instance: Records):
     Возвращает:
         dict
     """
-    instance.delete()
-    return {"status": "OK"}
\ No newline at end of file
+    deltas = {}
+    add_daily_totals_delta(deltas, instance, -1)
+    pk = instance.pk
+    with transaction.atomic():
+        instance.delete()
+        after_records_changed(deltas, [pk], RecordChange.DELETE)
+    return {"status": "OK"}
+
+
+def resolve_bulk_changes(data: dict) -> dict:
+    """
+    Проверяет изменения для массового обновления записей один раз на весь набор
+
+    Родительские элементы выводятся из самого глубокого переданного:
+    подкатегория задает категорию, категория - тип операции. Поэтому менять
+    категорию можно только вместе с подкатегорией, а тип - вместе с категорией
+    и подкатегорией, иначе обновленные записи нарушили бы иерархию.
+    При несовпадении зависимостей выкидывает ошибку ValidationError
+
+    Принимает:
+        data: dict - validated_data из RecordsSerializer(partial=True)
+
+    Возвращает:
+        dict - {поле: значение} для QuerySet.update
+    """
+    changes = {}
+    if "status" in data:
+        changes["status"] = get_status(data["status"])
+
+    if "subcategory" in data:
+        subcategory = get_subcategory(data["subcategory"])
+        category = get_dictionary_item("category", pk=subcategory.category_id)
+        if "category" in data and get_category(data["category"]).pk != category.pk:
+            raise ValidationError("Подкатегория не принадлежит выбранной категории")
+        type = get_dictionary_item("type", pk=category.type_id)
+        if "type" in data and get_type(data["type"]).pk != type.pk:
+            raise ValidationError("Категория не принадлежит выбранному типу операции")
+        changes.update(type=type, category=category, subcategory=subcategory)
+    elif "category" in data or "type" in data:
+        raise ValidationError("Чтобы сменить категорию или тип операции, укажите подкатегорию")
+
+    for field in ("amount", "comment"):
+        if field in data:
+            changes[field] = data[field]
+    return changes
+
+def _chunks(ids: list, size: int = None):
+    size = size or settings.RECORDS_BULK_BATCH_SIZE
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def _daily_totals_buckets(query):
+    return (query.values_list(*DAILY_TOTALS_KEY)
+            .annotate(total=Sum("amount"), count=Count("pk")).order_by())
+
+def bulk_update_records(query, data: dict) -> int:
+    """
+    Массово обновляет выбранные записи операций в одной транзакции
+
+    Изменения проверяются один раз (см. resolve_bulk_changes) и пишутся
+    UPDATE по пачкам ID. Суммы за день пересчитываются по сгруппированным
+    суммам затронутых записей, без чтения самих записей.
+
+    Принимает:
+        query: QuerySet[Records] - например, результат get_filtered_records
+        data: dict - validated_data из RecordsSerializer(partial=True)
+
+    Возвращает:
+        int - количество измененных записей
+    """
+    changes = resolve_bulk_changes(data)
+    if not changes:
+        raise ValidationError("Nothing to update")
+    key_changes = {f"{field}_id": changes[field].pk for field in REPORT_DIMENSIONS if field in changes}
+    updated_at = clock.now()
+
+    with transaction.atomic():
+        ids = list(query.select_for_update().values_list("pk", flat=True))
+        deltas = {}
+        for chunk in _chunks(ids):
+            target = Records.objects.filter(pk__in=chunk)
+            for *key, total, count in _daily_totals_buckets(target):
+                bucket = dict(zip(DAILY_TOTALS_KEY, key), **key_changes)
+                new_total = changes["amount"] * count if "amount" in changes else total
+                add_daily_totals_bucket_delta(deltas, tuple(key), -total, -count)
+                add_daily_totals_bucket_delta(deltas, tuple(bucket[f] for f in DAILY_TOTALS_KEY), new_total, count)
+            target.update(**changes, updated_at=updated_at, version=F("version") + 1)
+        if ids:
+            after_records_changed(deltas, ids, RecordChange.UPSERT)
+    return len(ids)
+
+def bulk_delete_records(query) -> int:
+    """
+    Массово удаляет выбранные записи операций в одной транзакции
+
+    Записи удаляются DELETE по пачкам ID, суммы за день уменьшаются
+    на сгруппированные суммы удаленных записей.
+
+    Принимает:
+        query: QuerySet[Records] - например, результат get_filtered_records
+
+    Возвращает:
+        int - количество удаленных записей
+    """
+    with transaction.atomic():
+        ids = list(query.select_for_update().values_list("pk", flat=True))
+        deltas = {}
+        for chunk in _chunks(ids):
+            target = Records.objects.filter(pk__in=chunk)
+            for *key, total, count in _daily_totals_buckets(target):
+                add_daily_totals_bucket_delta(deltas, tuple(key), -total, -count)
+            target.delete()
+        if ids:
+            after_records_changed(deltas, ids, RecordChange.DELETE)
+    return len(ids)
+
+def submit_job(kind: str, params: dict = None) -> Job:
+    """
+    Ставит фоновую задачу в очередь команды run_jobs
+
+    Принимает:
+        kind: str - вид задачи (Job.EXPORT, Job.IMPORT, Job.REBUILD_DAILY_TOTALS)
+        params (dict, optional): Параметры задачи
+
+    Возвращает:
+        Job - созданная задача
+    """
+    return Job.objects.create(kind=kind, params=params or {})
+
+def claim_job(pk: int) -> bool:
+    """
+    Забирает задачу из очереди одним условным UPDATE
+
+    Если задачу уже забрал другой воркер, ничего не меняет,
+    поэтому несколько команд run_jobs могут работать одновременно.
+
+    Принимает:
+        pk: int - ID задачи
+
+    Возвращает:
+        bool - True, если задача переведена в состояние "running"
+    """
+    return bool(Job.objects.filter(pk=pk, status=Job.QUEUED)
+                .update(status=Job.RUNNING, started_at=clock.now()))
+
+def update_job_progress(pk: int, processed: int, total: int = None):
+    """
+    Сохраняет прогресс выполняющейся задачи
+
+    Принимает:
+        pk: int - ID задачи
+        processed: int - сколько строк обработано
+        total (int, optional): Сколько строк всего
+    """
+    changes = {"processed": processed}
+    if total is not None:
+        changes["total"] = total
+    Job.objects.filter(pk=pk).update(**changes)
+
+def finish_job(pk: int, result=None, result_file: str = ""):
+    """
+    Отмечает задачу выполненной
+
+    Принимает:
+        pk: int - ID задачи
+        result (optional): Итог задачи (JSON)
+        result_file (str, optional): Имя файла результата в RECORDS_JOBS_DIR
+    """
+    Job.objects.filter(pk=pk).update(
+        status=Job.DONE, result=result, result_file=result_file, finished_at=clock.now(),
+    )
+
+def fail_job(pk: int, error: str):
+    """
+    Отмечает задачу упавшей
+
+    Принимает:
+        pk: int - ID задачи
+        error: str - текст ошибки
+    """
+    Job.objects.filter(pk=pk).update(status=Job.FAILED, error=error, finished_at=clock.now())
+
+def requeue_running_jobs() -> int:
+    """
+    Возвращает в очередь задачи, оставшиеся в состоянии "running"
+    после аварийной остановки воркера
+
+    Возвращает:
+        int - количество задач
+    """
+    return Job.objects.filter(status=Job.RUNNING).update(status=Job.QUEUED, started_at=None, processed=0)
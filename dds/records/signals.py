@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from records.models import Records, RecordChange, Status, Type, Category, Subcategory
+from records.selectors import invalidate_reference_data, REFERENCE_TREE_TABLE
+from records.services import bump_table_version, log_record_changes
+
+
+@receiver([post_save, post_delete], sender=Status)
+@receiver([post_save, post_delete], sender=Type)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Subcategory)
+def invalidate_dictionary_cache(sender, **kwargs):
+    """
+    Сбрасывает закэшированный справочник и увеличивает версии таблиц
+    при любом изменении его элементов
+
+    Сброс повторяется после коммита, чтобы снимок, прочитанный параллельным
+    запросом до коммита транзакции, не остался в кэше.
+    """
+    invalidate_reference_data()
+    transaction.on_commit(invalidate_reference_data)
+    # Названия справочника входят в представление записей, а удаление
+    # элемента справочника каскадно удаляет записи
+    names = [sender._meta.model_name, "records"]
+    if sender is not Status:
+        names.append(REFERENCE_TREE_TABLE)
+    bump_table_version(*names)
+
+
+@receiver(pre_delete, sender=Status)
+@receiver(pre_delete, sender=Type)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Subcategory)
+def log_cascade_deleted_records(sender, instance, **kwargs):
+    """
+    Пишет в журнал изменений удаление записей, которые удалятся каскадно
+    вместе с элементом справочника
+    """
+    records = Records.objects.filter(**{sender._meta.model_name: instance}).values_list("pk", flat=True)
+    log_record_changes(records.iterator(), RecordChange.DELETE)
+
+
+@receiver(pre_save, sender=Status)
+@receiver(pre_save, sender=Type)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Subcategory)
+def remember_old_title(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает название элемента справочника до сохранения для log_renamed_records
+
+    Если название не сохраняется (update_fields без title) или элемент новый,
+    база не читается.
+    """
+    instance._old_title = None
+    if instance.pk is not None and (update_fields is None or "title" in update_fields):
+        instance._old_title = sender.objects.filter(pk=instance.pk).values_list("title", flat=True).first()
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_save, sender=Type)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Subcategory)
+def log_renamed_records(sender, instance, created, **kwargs):
+    """
+    Пишет в журнал изменений записи, в представлении которых
+    поменялось название элемента справочника
+
+    Сохранение без смены названия журнал не меняет.
+    """
+    old_title = instance.__dict__.pop("_old_title", None)
+    if not created and old_title is not None and old_title != instance.title:
+        records = Records.objects.filter(**{sender._meta.model_name: instance}).values_list("pk", flat=True)
+        log_record_changes(records.iterator(), RecordChange.UPSERT)
@@ -0,0 +1,41 @@
+'use strict';
+// Связанные списки формы записи: при выборе типа подгружаются его категории,
+// при выборе категории - ее подкатегории (GET /api/v1/tree/children/).
+// Список помечается атрибутами data-chained-parent и data-chained-url (см. ChainedSelect).
+{
+    const $ = django.jQuery;
+
+    function setOptions(select, items) {
+        const selected = select.value;
+        // Первый вариант - пустой ("---------")
+        const empty = select.options.length && select.options[0].value === '' ? select.options[0] : null;
+        select.replaceChildren(...(empty ? [empty] : []));
+        for (const item of items) {
+            select.add(new Option(item.title, item.id, false, String(item.id) === selected));
+        }
+        $(select).trigger('change');
+    }
+
+    function reload(select, parentValue) {
+        if (!parentValue) {
+            setOptions(select, []);
+            return;
+        }
+        const url = new URL(select.dataset.chainedUrl, window.location.origin);
+        url.searchParams.set(select.dataset.chainedParent, parentValue);
+        fetch(url, {headers: {Accept: 'application/json'}, credentials: 'same-origin'})
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(data => setOptions(select, data.results))
+            .catch(error => console.error('chained_select:', select.name, error));
+    }
+
+    $(document).ready(function() {
+        for (const select of document.querySelectorAll('select[data-chained-parent]')) {
+            // Родитель может быть виджетом автодополнения (select2), он сообщает
+            // об изменениях только событиями jQuery
+            $('#id_' + select.dataset.chainedParent).on('change', function() {
+                reload(select, this.value);
+            });
+        }
+    });
+}
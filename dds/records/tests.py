@@ -1,3 +1,1177 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import tempfile
+import threading
+import tracemalloc
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.exceptions import ValidationError
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+
+from records import clock, renderers
+from records.benchmarks import asgi_request, percentile, run_api_benchmark, seed_ledger, wsgi_request
+from records.clock import override_clock
+from records.forms import RecordForm
+from records.metrics import DB_DURATION, DB_QUERIES, HISTOGRAMS
+from records.middleware import PrimaryStickinessMiddleware, PRIMARY_COOKIE
+from records.admin import RecordsAdmin
+from records.models import Records, Status, Type, Category, Subcategory, DailyTotals, RecordChange, Job
+from records.renderers import FastJSONRenderer, dumps
+from records.routers import PrimaryReplicaRouter, pin_to_primary, primary_pinning
+from records.selectors import (get_filtered_records, get_reference_data, get_dictionary_item,
+                               invalidate_reference_data, get_daily_totals_mismatches, get_records_rows,
+                               get_record_by_id, get_record_changes, get_records_page, search_records,
+                               REFERENCE_DATA_CACHE_KEY)
+from records.serializers import RecordsSerializer, serialize_record_rows
+from records.services import (create_record, update_record, delete_record, bulk_create_records,
+                              RecordVersionConflict, claim_job, bump_table_version)
+from records.views import AsyncRecordsView, AsyncRecordDetailView, AsyncExportRecordsView
+
+
+class RecordsTestMixin:
+    """
+    Общие данные справочника для тестов записей
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(title="Бизнес")
+        cls.type = Type.objects.create(title="Списание")
+        cls.category = Category.objects.create(title="Маркетинг", type=cls.type)
+        cls.subcategory = Subcategory.objects.create(title="Avito", category=cls.category)
+
+    def create_records(self, count, **kwargs):
+        bulk_create_records([
+            Records(
+                status=kwargs.get("status", self.status),
+                type=kwargs.get("type", self.type),
+                category=kwargs.get("category", self.category),
+                subcategory=kwargs.get("subcategory", self.subcategory),
+                amount=kwargs.get("amount", 100),
+                comment=kwargs.get("comment", ""),
+            )
+            for _ in range(count)
+        ])
+
+
+class RecordsListTests(RecordsTestMixin, TestCase):
+    def get_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/v1/records/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_list_returns_titles(self):
+        self.create_records(1)
+        response, _ = self.get_list_queries()
+        record = response.json()["records"][0]
+        self.assertEqual(record["status"], "Бизнес")
+        self.assertEqual(record["type"], "Списание")
+        self.assertEqual(record["category"], "Маркетинг")
+        self.assertEqual(record["subcategory"], "Avito")
+        self.assertEqual(record["amount"], 100)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_records(1)
+        _, few = self.get_list_queries()
+        self.create_records(50)
+        response, many = self.get_list_queries()
+        self.assertEqual(len(response.json()["records"]), 51)
+        self.assertEqual(few, many)
+
+
+@override_settings(RECORDS_PAGE_SIZE=10, RECORDS_MAX_PAGE_SIZE=20)
+class RecordsPaginationTests(RecordsTestMixin, TestCase):
+    def fetch_all(self, params=""):
+        ids, cursor = [], None
+        while True:
+            url = f"/api/v1/records/?{params}" + (f"&cursor={cursor}" if cursor else "")
+            data = self.client.get(url).json()
+            ids.extend(record["id"] for record in data["records"])
+            cursor = data["next"]
+            if cursor is None:
+                return ids
+
+    def test_walks_all_records_newest_first(self):
+        self.create_records(25)
+        ids = self.fetch_all()
+        self.assertEqual(ids, sorted(Records.objects.values_list("pk", flat=True), reverse=True))
+
+    def test_inserts_do_not_shift_pages(self):
+        self.create_records(15)
+        first = self.client.get("/api/v1/records/").json()
+        self.create_records(5)
+        second = self.client.get(f"/api/v1/records/?cursor={first['next']}").json()
+        seen = [record["id"] for record in first["records"] + second["records"]]
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(len(set(seen)), 15)
+        self.assertIsNone(second["next"])
+
+    def test_respects_filters(self):
+        other_status = Status.objects.create(title="Личное")
+        self.create_records(12)
+        self.create_records(3, status=other_status)
+        self.assertEqual(len(self.fetch_all("status=Личное")), 3)
+
+    def test_page_size_is_capped(self):
+        self.create_records(30)
+        data = self.client.get("/api/v1/records/?page_size=500").json()
+        self.assertEqual(len(data["records"]), 20)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/v1/records/?cursor=broken")
+        self.assertEqual(response.status_code, 400)
+
+
+class RecordsFilterTests(RecordsTestMixin, TestCase):
+    def setUp(self):
+        self.other_type = Type.objects.create(title="Пополнение")
+        self.other_category = Category.objects.create(title="Инфраструктура", type=self.other_type)
+        self.other_subcategory = Subcategory.objects.create(title="VPS", category=self.other_category)
+        self.create_records(2)
+        self.create_records(3, type=self.other_type, category=self.other_category,
+                            subcategory=self.other_subcategory)
+
+    def test_filter_by_ids(self):
+        data = self.client.get(f"/api/v1/records/?type_id={self.other_type.pk}").json()
+        self.assertEqual(len(data["records"]), 3)
+        data = self.client.get(f"/api/v1/records/?subcategory_id={self.subcategory.pk}").json()
+        self.assertEqual(len(data["records"]), 2)
+
+    def test_title_filter_has_no_joins(self):
+        get_filtered_records(type="Пополнение")  # прогрев кэша справочника
+        query = get_filtered_records(type="Пополнение", category="Инфраструктура")
+        with self.assertNumQueries(0):
+            sql = str(query.query)
+        self.assertNotIn("JOIN", sql)
+        self.assertEqual(query.count(), 3)
+
+    def test_unknown_title_returns_nothing(self):
+        data = self.client.get("/api/v1/records/?category=Нет такой").json()
+        self.assertEqual(data["records"], [])
+
+    def test_cache_follows_dictionary_changes(self):
+        get_filtered_records(type="Пополнение")
+        self.other_type.title = "Доход"
+        self.other_type.save()
+        self.assertEqual(get_filtered_records(type="Доход").count(), 3)
+
+    def test_invalid_id(self):
+        response = self.client.get("/api/v1/records/?type_id=abc")
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_date_error_shows_value(self):
+        for url in ("/api/v1/records/", "/api/v1/records/export/", "/api/v1/reports/"):
+            response = self.client.get(f"{url}?date_from=2024-13-45")
+            self.assertEqual(response.status_code, 400, url)
+            error = response.json()["error"]
+            self.assertIn("2024-13-45", error, url)
+            self.assertNotIn("%(value)s", error, url)
+
+
+class ReferenceDataTests(RecordsTestMixin, TestCase):
+    data = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг",
+            "subcategory": "Avito", "amount": 500}
+
+    def test_create_validates_without_dictionary_queries(self):
+        get_reference_data(refresh=True)
+        with CaptureQueriesContext(connection) as ctx:
+            record = create_record(self.data)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("SELECT")])
+        with self.assertNumQueries(0):
+            self.assertEqual(str(record), "Списание - 500р.")
+
+    def test_hierarchy_mismatch(self):
+        other_type = Type.objects.create(title="Пополнение")
+        with self.assertRaisesMessage(ValidationError, "Категория не принадлежит"):
+            create_record({**self.data, "type": other_type.title})
+
+    def test_viewset_changes_invalidate_cache(self):
+        get_reference_data()
+        response = self.client.patch(f"/api/v1/type/{self.type.pk}/", {"title": "Расход"},
+                                     content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_dictionary_item("type", pk=self.type.pk).title, "Расход")
+
+    def test_miss_does_not_reload_snapshot(self):
+        get_reference_data(refresh=True)
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(20):
+                with self.assertRaises(ValidationError):
+                    get_dictionary_item("category", "Нет такой")
+        self.assertEqual(len(ctx.captured_queries), 20)
+        self.assertFalse([q for q in ctx.captured_queries if "records_category" in q["sql"]])
+
+    def test_miss_reloads_after_change_in_other_process(self):
+        get_reference_data(refresh=True)
+        # Другой процесс: сигналы этого процесса не срабатывают, меняется только версия таблицы
+        Status.objects.bulk_create([Status(title="Личное")])
+        bump_table_version("status")
+        self.assertEqual(get_dictionary_item("status", "Личное").title, "Личное")
+
+    @override_settings(RECORDS_REFERENCE_CACHE="default")
+    def test_shared_cache_backend(self):
+        invalidate_reference_data()
+        get_reference_data()
+        self.assertIsNotNone(caches["default"].get(REFERENCE_DATA_CACHE_KEY))
+        with self.assertNumQueries(0):
+            get_dictionary_item("status", "Бизнес")
+        Status.objects.create(title="Личное")
+        self.assertIsNone(caches["default"].get(REFERENCE_DATA_CACHE_KEY))
+
+
+class ReferenceTreeTests(RecordsTestMixin, TestCase):
+    def test_tree(self):
+        other_type = Type.objects.create(title="Пополнение")
+        response = self.client.get("/api/v1/tree/")
+        self.assertEqual(response.json()["tree"], [
+            {"id": self.type.pk, "title": "Списание", "categories": [
+                {"id": self.category.pk, "title": "Маркетинг", "subcategories": [
+                    {"id": self.subcategory.pk, "title": "Avito"},
+                ]},
+            ]},
+            {"id": other_type.pk, "title": "Пополнение", "categories": []},
+        ])
+
+    def test_conditional_get_and_invalidation(self):
+        etag = self.client.get("/api/v1/tree/").headers["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/v1/tree/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        Subcategory.objects.create(title="Яндекс", category=self.category)
+        response = self.client.get("/api/v1/tree/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        titles = [s["title"] for s in response.json()["tree"][0]["categories"][0]["subcategories"]]
+        self.assertEqual(titles, ["Avito", "Яндекс"])
+
+    def test_status_changes_keep_tree_version(self):
+        etag = self.client.get("/api/v1/tree/").headers["ETag"]
+        Status.objects.create(title="Личное")
+        self.assertEqual(self.client.get("/api/v1/tree/", headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_stale_snapshot_is_reloaded(self):
+        self.client.get("/api/v1/tree/")
+        # Справочник изменил другой процесс: локальный снимок не сброшен, но версия дерева выросла
+        Subcategory.objects.bulk_create([Subcategory(title="Яндекс", category=self.category)])
+        bump_table_version("tree")
+        categories = self.client.get("/api/v1/tree/").json()["tree"][0]["categories"]
+        self.assertEqual(len(categories[0]["subcategories"]), 2)
+
+    def test_children(self):
+        Category.objects.create(title="Зарплата", type=Type.objects.create(title="Пополнение"))
+        response = self.client.get(f"/api/v1/tree/children/?type={self.type.pk}")
+        self.assertEqual(response.json(), {"results": [{"id": self.category.pk, "title": "Маркетинг"}]})
+        response = self.client.get(f"/api/v1/tree/children/?category={self.category.pk}")
+        self.assertEqual(response.json(), {"results": [{"id": self.subcategory.pk, "title": "Avito"}]})
+        self.assertEqual(self.client.get("/api/v1/tree/children/?type=999").json(), {"results": []})
+
+        etag = response.headers["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/v1/tree/children/?category={self.category.pk}",
+                                       headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_children_requires_one_parent(self):
+        for query in ("", "?type=1&category=1", "?type=x"):
+            self.assertEqual(self.client.get(f"/api/v1/tree/children/{query}").status_code, 400)
+
+    def test_record_form_uses_cached_tree(self):
+        other_category = Category.objects.create(title="Зарплата", type=Type.objects.create(title="Пополнение"))
+        record = create_record({"status": "Бизнес", "type": "Списание", "category": "Маркетинг",
+                                "subcategory": "Avito", "amount": 500})
+        get_reference_data()
+        with self.assertNumQueries(0):
+            form = RecordForm(instance=record)
+            html = form.as_p()
+        self.assertIn("Маркетинг", html)
+        self.assertNotIn("Зарплата", html)
+
+        data = {"status": self.status.pk, "type": self.type.pk, "category": other_category.pk,
+                "subcategory": self.subcategory.pk, "amount": 10}
+        form = RecordForm(data=data, instance=record)
+        self.assertFalse(form.is_valid())
+        self.assertIn("category", form.errors)
+        form = RecordForm(data={**data, "category": self.category.pk}, instance=record)
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+class RecordsAdminTests(RecordsTestMixin, TestCase):
+    url = "/admin/records/records/"
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        get_reference_data(refresh=True)
+
+    def changelist_queries(self, query=""):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return response, [q["sql"] for q in ctx.captured_queries if "records_records" in q["sql"]]
+
+    def test_queries_do_not_depend_on_rows(self):
+        self.create_records(3)
+        _, few = self.changelist_queries()
+        self.create_records(50)
+        response, many = self.changelist_queries()
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(len(response.context["cl"].result_list), 53)
+
+    def test_no_full_table_count(self):
+        self.create_records(5)
+        with override_settings(RECORDS_ADMIN_COUNT_LIMIT=3):
+            response, queries = self.changelist_queries()
+        # Строк не меньше порога: показывается оценка по DailyTotals
+        self.assertEqual(response.context["cl"].result_count, 5)
+        self.assertTrue(all("LIMIT 3" in sql for sql in queries if "COUNT(" in sql))
+
+        # Фильтр по справочнику выводится, только если в нем больше одного варианта
+        self.create_records(2, status=Status.objects.create(title="Личное"))
+        get_reference_data(refresh=True)
+        with override_settings(RECORDS_ADMIN_COUNT_LIMIT=3):
+            response, queries = self.changelist_queries(f"?status__id__exact={self.status.pk}")
+        self.assertEqual(response.context["cl"].result_count, 3)
+        self.assertTrue(all("LIMIT 3" in sql for sql in queries if "COUNT(" in sql))
+
+    @mock.patch.object(RecordsAdmin, "list_per_page", 2)
+    def test_stale_estimate_does_not_hide_rows(self):
+        self.create_records(5)
+        # Сводка разошлась с таблицей (например, после loaddata или SQL в обход сервисов)
+        DailyTotals.objects.all().delete()
+        response, _ = self.changelist_queries()
+        self.assertEqual(response.context["cl"].result_count, 5)
+
+        with override_settings(RECORDS_ADMIN_COUNT_LIMIT=3):
+            response, _ = self.changelist_queries()
+            self.assertEqual(response.context["cl"].result_count, 3)
+            seen = [record.pk for record in response.context["cl"].result_list]
+            for page in (2, 3):
+                response, _ = self.changelist_queries(f"?p={page}")
+                seen += [record.pk for record in response.context["cl"].result_list]
+            self.assertRedirects(self.client.get(f"{self.url}?p=4"), f"{self.url}?e=1")
+        self.assertEqual(sorted(seen), sorted(Records.objects.values_list("pk", flat=True)))
+
+    def test_filter_choices_and_form_widgets_from_cache(self):
+        self.create_records(1)
+        record = Records.objects.get()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+            response = self.client.get(f"{self.url}{record.pk}/change/")
+        dictionary_tables = ("records_status", "records_type", "records_category", "records_subcategory")
+        self.assertFalse([q["sql"] for q in ctx.captured_queries
+                          if any(f'FROM "{table}"' in q["sql"] for table in dictionary_tables)])
+        html = response.content.decode()
+        self.assertIn("admin-autocomplete", html)
+        self.assertIn(f'<option value="{self.subcategory.pk}" selected>Avito</option>', html)
+
+
+    def test_add_form_renders_children_of_selected_parent_only(self):
+        Category.objects.create(title="Зарплата", type=Type.objects.create(title="Пополнение"))
+        html = self.client.get(f"{self.url}add/").content.decode()
+        self.assertNotIn("Маркетинг", html)
+        self.assertNotIn("Зарплата", html)
+        self.assertIn('data-chained-url="/api/v1/tree/children/"', html)
+        self.assertIn("records/admin/chained_select.js", html)
+
+        html = self.client.get(f"{self.url}add/?type={self.type.pk}").content.decode()
+        self.assertIn("Маркетинг", html)
+        self.assertNotIn("Зарплата", html)
+
+
+class BulkCreateRecordsTests(RecordsTestMixin, TestCase):
+    row = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг",
+           "subcategory": "Avito", "amount": 100}
+
+    def post(self, body, content_type="application/json", query=""):
+        return self.client.post(f"/api/v1/records/bulk/{query}", body, content_type=content_type)
+
+    def test_json_array(self):
+        response = self.post(json.dumps([self.row] * 5))
+        self.assertEqual(response.json(), {"created": 5, "errors": []})
+        self.assertEqual(Records.objects.count(), 5)
+
+    def test_ndjson_stream(self):
+        body = "\n".join(json.dumps(self.row) for _ in range(3)) + "\n"
+        response = self.post(body, content_type="application/x-ndjson")
+        self.assertEqual(response.json()["created"], 3)
+
+    def test_invalid_rows_are_reported(self):
+        rows = [self.row, {**self.row, "amount": 0}, {**self.row, "category": "Нет"}, self.row]
+        data = self.post(json.dumps(rows)).json()
+        self.assertEqual(data["created"], 2)
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2])
+        self.assertEqual(Records.objects.count(), 2)
+
+    def test_unknown_titles_do_not_reload_dictionary(self):
+        self.post(json.dumps([self.row]))
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.post(json.dumps([{**self.row, "subcategory": "Нет"}] * 50)).json()
+        self.assertEqual(len(data["errors"]), 50)
+        self.assertFalse([q for q in ctx.captured_queries if "records_subcategory" in q["sql"]])
+
+    def test_strict_mode_writes_nothing(self):
+        rows = [self.row, {**self.row, "amount": 0}]
+        response = self.post(json.dumps(rows), query="?strict=true")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Records.objects.count(), 0)
+
+    @override_settings(RECORDS_BULK_BATCH_SIZE=2)
+    def test_inserts_in_batches(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.post(json.dumps([self.row] * 5))
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "records_records"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(Records.objects.count(), 5)
+
+
+class ExportRecordsTests(RecordsTestMixin, TestCase):
+    def export(self, query=""):
+        response = self.client.get(f"/api/v1/records/export/{query}")
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        self.create_records(3)
+        lines = self.export("?output=csv").splitlines()
+        self.assertEqual(lines[0], "id,date,status,type,category,subcategory,amount,comment,version")
+        self.assertEqual(len(lines), 4)
+        self.assertIn("Бизнес,Списание,Маркетинг,Avito,100", lines[1])
+
+    def test_ndjson_with_filters(self):
+        other_status = Status.objects.create(title="Личное")
+        self.create_records(2)
+        self.create_records(1, status=other_status)
+        lines = self.export("?output=ndjson&status=Личное").splitlines()
+        self.assertEqual([json.loads(line)["status"] for line in lines], ["Личное"])
+
+    def test_unknown_format(self):
+        response = self.client.get("/api/v1/records/export/?output=xml")
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(connection.vendor == "sqlite", "быстрое заполнение через SQLite")
+    @override_settings(RECORDS_EXPORT_CHUNK_SIZE=500)
+    def test_large_export_memory_is_bounded(self):
+        rows = 20_000
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s) "
+                "INSERT INTO records_records "
+                "(date, status_id, type_id, category_id, subcategory_id, amount, comment, updated_at, version) "
+                "SELECT date('now', '-' || (n % 365) || ' days'), %s, %s, %s, %s, n, '', datetime('now'), 1 FROM seq",
+                [rows, self.status.pk, self.type.pk, self.category.pk, self.subcategory.pk],
+            )
+
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            response = self.client.get("/api/v1/records/export/?output=csv")
+            lines = sum(chunk.count(b"\n") for chunk in response.streaming_content)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(lines, rows + 1)
+        # Все строки в памяти - около 650 байт на строку, потоковая выгрузка пачками - около 40
+        self.assertLess(peak / rows, 200)
+
+
+class RecordsReportTests(RecordsTestMixin, TestCase):
+    def setUp(self):
+        self.other_type = Type.objects.create(title="Пополнение")
+        self.other_category = Category.objects.create(title="Продажи", type=self.other_type)
+        self.other_subcategory = Subcategory.objects.create(title="Маркетплейс", category=self.other_category)
+        self.create_records(3, amount=100)
+        self.create_records(2, amount=1000, type=self.other_type, category=self.other_category,
+                            subcategory=self.other_subcategory)
+
+    def report(self, query):
+        response = self.client.get(f"/api/v1/reports/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["report"]
+
+    def test_totals_without_grouping(self):
+        self.assertEqual(self.report(""), {"total": [2300], "count": [5]})
+
+    def test_group_by_period_and_type(self):
+        today = clock.today()
+        report = self.report("?period=month&group_by=type")
+        self.assertEqual(report["period"], [today.replace(day=1).isoformat()] * 2)
+        self.assertEqual(dict(zip(report["type"], report["total"])), {"Списание": 300, "Пополнение": 2000})
+        self.assertEqual(sorted(report["count"]), [2, 3])
+
+    def test_uses_record_filters(self):
+        report = self.report("?group_by=category,subcategory&type=Пополнение")
+        self.assertEqual(report, {"category": ["Продажи"], "subcategory": ["Маркетплейс"],
+                                  "total": [2000], "count": [2]})
+
+    def test_invalid_grouping(self):
+        self.assertEqual(self.client.get("/api/v1/reports/?group_by=amount").status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/reports/?period=decade").status_code, 400)
+
+
+class DailyTotalsTests(RecordsTestMixin, TestCase):
+    data = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг",
+            "subcategory": "Avito", "amount": 500}
+
+    def setUp(self):
+        self.other_category = Category.objects.create(title="Зарплата", type=self.type)
+        self.other_subcategory = Subcategory.objects.create(title="Премии", category=self.other_category)
+
+    def assertTotalsMatch(self):
+        self.assertEqual(get_daily_totals_mismatches(), [])
+
+    def test_create_update_delete_keep_totals(self):
+        record = create_record(self.data)
+        self.create_records(3)
+        self.assertEqual(DailyTotals.objects.get().records_count, 4)
+        update_record(record, {"amount": 50})
+        self.assertTotalsMatch()
+        update_record(record, {"category": "Зарплата", "subcategory": "Премии"})
+        self.assertEqual(DailyTotals.objects.count(), 2)
+        self.assertTotalsMatch()
+        delete_record(record)
+        self.assertEqual(DailyTotals.objects.count(), 1)
+        self.assertTotalsMatch()
+
+    def test_report_reads_rollup(self):
+        self.create_records(4, amount=250)
+        with CaptureQueriesContext(connection) as ctx:
+            report = self.client.get("/api/v1/reports/?group_by=type").json()["report"]
+        self.assertEqual(report["total"], [1000])
+        self.assertEqual(report["count"], [4])
+        self.assertFalse(any("records_records" in q["sql"] for q in ctx.captured_queries))
+
+    def test_rebuild_command(self):
+        self.create_records(3)
+        DailyTotals.objects.update(amount=1)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_daily_totals", "--verify-only", stdout=io.StringIO(), stderr=io.StringIO())
+        call_command("rebuild_daily_totals", stdout=io.StringIO())
+        self.assertTotalsMatch()
+
+
+class RequestClockTests(RecordsTestMixin, TestCase):
+    data = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг",
+            "subcategory": "Avito", "amount": 500}
+
+    def test_list_follows_clock_across_midnight(self):
+        moment = datetime.datetime(2024, 3, 10, 23, 59, tzinfo=datetime.timezone.utc)
+        with override_clock(lambda: moment):
+            create_record(self.data)
+            self.assertEqual(len(self.client.get("/api/v1/records/").json()["records"]), 1)
+
+        moment += datetime.timedelta(minutes=2)
+        with override_clock(lambda: moment):
+            record = create_record(self.data)
+            self.assertEqual(record.date, datetime.date(2024, 3, 11))
+            self.assertEqual(len(self.client.get("/api/v1/records/").json()["records"]), 2)
+
+    @override_settings(TIME_ZONE="Europe/Moscow")
+    def test_today_respects_time_zone(self):
+        moment = datetime.datetime(2024, 3, 10, 22, 0, tzinfo=datetime.timezone.utc)
+        with override_clock(lambda: moment):
+            self.assertEqual(clock.today(), datetime.date(2024, 3, 11))
+            self.assertEqual(create_record(self.data).date, datetime.date(2024, 3, 11))
+
+
+class ConditionalGetTests(RecordsTestMixin, TestCase):
+    def test_records_list_not_modified(self):
+        self.create_records(2)
+        response = self.client.get("/api/v1/records/")
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/v1/records/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.create_records(1)
+        response = self.client.get("/api/v1/records/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["records"]), 3)
+
+    def test_record_detail_if_modified_since(self):
+        record = create_record({"status": "Бизнес", "type": "Списание", "category": "Маркетинг",
+                                "subcategory": "Avito", "amount": 500})
+        url = f"/api/v1/records/{record.pk}/"
+        last_modified = self.client.get(url)["Last-Modified"]
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_dictionary_rename_changes_etags(self):
+        records_etag = self.client.get("/api/v1/records/")["ETag"]
+        type_etag = self.client.get("/api/v1/type/")["ETag"]
+        self.assertEqual(self.client.get("/api/v1/type/", HTTP_IF_NONE_MATCH=type_etag).status_code, 304)
+        self.client.patch(f"/api/v1/type/{self.type.pk}/", {"title": "Расход"}, content_type="application/json")
+        self.assertEqual(self.client.get("/api/v1/type/", HTTP_IF_NONE_MATCH=type_etag).status_code, 200)
+        self.assertEqual(self.client.get("/api/v1/records/", HTTP_IF_NONE_MATCH=records_etag).status_code, 200)
+
+
+class RecordChangesTests(RecordsTestMixin, TestCase):
+    data = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг",
+            "subcategory": "Avito", "amount": 500}
+
+    def changes(self, since=0, page_size=100):
+        response = self.client.get(f"/api/v1/records/changes/?since={since}&page_size={page_size}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sync_returns_only_changes_since_token(self):
+        first = create_record(self.data)
+        second = create_record(self.data)
+        initial = self.changes()
+        self.assertEqual([r["id"] for r in initial["records"]], [first.pk, second.pk])
+
+        second_pk = second.pk
+        update_record(first, {"amount": 10})
+        delete_record(second)
+        delta = self.changes(initial["next"])
+        self.assertEqual([(r["id"], r["amount"]) for r in delta["records"]], [(first.pk, 10)])
+        self.assertEqual(delta["deleted"], [second_pk])
+        self.assertEqual(self.changes(delta["next"])["records"], [])
+
+    def test_paging_through_changes(self):
+        self.create_records(5)
+        page = self.changes(page_size=3)
+        self.assertTrue(page["has_more"])
+        rest = self.changes(page["next"], page_size=3)
+        self.assertFalse(rest["has_more"])
+        self.assertEqual(len(page["records"]) + len(rest["records"]), 5)
+
+    def test_cascade_delete_produces_tombstones(self):
+        pk = create_record(self.data).pk
+        token = self.changes()["next"]
+        self.category.delete()
+        self.assertEqual(self.changes(token)["deleted"], [pk])
+
+    def test_invalid_token(self):
+        self.assertEqual(self.client.get("/api/v1/records/changes/?since=abc").status_code, 400)
+
+    def test_only_rename_logs_referencing_records(self):
+        pk = create_record(self.data).pk
+        token = self.changes()["next"]
+        self.category.save()
+        self.category.save(update_fields=["type"])
+        self.assertEqual(RecordChange.objects.filter(pk__gt=token).count(), 0)
+        self.category.title = "Реклама"
+        self.category.save()
+        self.assertEqual([r["id"] for r in self.changes(token)["records"]], [pk])
+
+    def test_log_is_written_under_table_version_lock(self):
+        # ID журнала выдаются только после UPDATE строки TableVersion "records"
+        # в той же транзакции: на PostgreSQL это упорядочивает ID по коммитам
+        record = create_record(self.data)
+        with CaptureQueriesContext(connection) as ctx:
+            create_record(self.data)
+            update_record(record, {"amount": 10})
+            self.category.title = "Реклама"
+            self.category.save()
+            self.category.delete()
+        queries = [q["sql"] for q in ctx.captured_queries]
+        inserts = [i for i, sql in enumerate(queries) if sql.startswith('INSERT INTO "records_recordchange"')]
+        self.assertGreaterEqual(len(inserts), 4)
+        for previous, current in zip([-1] + inserts, inserts):
+            self.assertTrue([sql for sql in queries[previous + 1:current]
+                             if sql.startswith('UPDATE "records_tableversion"') and "'records'" in sql])
+
+
+class MetricsTests(RecordsTestMixin, TestCase):
+    def setUp(self):
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+
+    def test_metrics_are_recorded_per_route(self):
+        self.create_records(3)
+        self.client.get("/api/v1/records/")
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('dds_request_duration_seconds_count{route="api/v1/records/",method="GET"} 1', body)
+        self.assertIn('dds_db_queries_count{route="api/v1/records/",method="GET"} 1', body)
+        self.assertIn('dds_serialization_duration_seconds_bucket{route="api/v1/records/",method="GET",le="+Inf"} 1',
+                      body)
+
+    @override_settings(METRICS_MAX_QUERIES=0)
+    def test_warns_above_query_threshold(self):
+        with self.assertLogs("records.metrics", level="WARNING") as logs:
+            self.client.get("/api/v1/records/")
+        self.assertIn("GET api/v1/records/", logs.output[0])
+
+
+class ApiBenchmarkTests(TestCase):
+    def test_runs_every_scenario(self):
+        ledger = seed_ledger(records=50, categories_per_type=2, subcategories_per_category=2)
+        results = run_api_benchmark(ledger, repeat=3, client=self.client)
+        self.assertEqual(set(results), {"list", "filter", "detail", "create", "update", "export", "report"})
+        for result in results.values():
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertGreater(result["throughput_rps"], 0)
+        self.assertEqual(Records.objects.count(), 53)
+
+    def test_percentile(self):
+        self.assertEqual(percentile([4, 1, 3, 2], 0.5), 2)
+        self.assertEqual(percentile(list(range(1, 101)), 0.95), 95)
+
+
+class FastRenderingTests(RecordsTestMixin, TestCase):
+    def test_list_matches_records_serializer(self):
+        self.create_records(3, comment="Реклама")
+        expected = RecordsSerializer(Records.objects.order_by("-date", "-pk"), many=True).data
+        self.assertEqual(self.client.get("/api/v1/records/").json()["records"], json.loads(json.dumps(expected)))
+
+    def test_stdlib_fallback_renders_same_json(self):
+        self.create_records(2, comment="Реклама")
+        data = {"records": serialize_record_rows(get_records_rows(Records.objects.all())), "total": Decimal("1.5")}
+        with mock.patch.object(renderers, "orjson", None):
+            fallback = FastJSONRenderer().render(data)
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(fallback))
+        self.assertIn("Реклама".encode(), fallback)
+
+    def test_indent_uses_default_renderer(self):
+        self.assertIn(b"\n", FastJSONRenderer().render({"a": 1}, "application/json; indent=2"))
+
+
+class UpdateRecordTests(RecordsTestMixin, TestCase):
+    def setUp(self):
+        self.create_records(1, amount=100, comment="Реклама")
+        self.record = Records.objects.get()
+        self.url = f"/api/v1/records/{self.record.pk}/"
+        get_reference_data()
+
+    def patch(self, data):
+        return self.client.patch(self.url, data, content_type="application/json")
+
+    def test_patch_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.patch({"amount": 150})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["record"]["version"], 2)
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertFalse(any("records_category" in q or "records_status" in q for q in sql))
+        update = next(q for q in sql if q.startswith('UPDATE "records_records"'))
+        self.assertIn('"amount"', update)
+        self.assertNotIn('"comment"', update)
+        self.assertEqual(get_daily_totals_mismatches(), [])
+
+    def test_stale_version_conflicts(self):
+        self.assertEqual(self.patch({"amount": 150, "version": 1}).status_code, 200)
+        response = self.patch({"amount": 200, "version": 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["record"]["amount"], 150)
+        self.assertEqual(Records.objects.get().amount, 150)
+
+    def test_concurrent_write_is_detected(self):
+        stale = get_record_by_id(self.record.pk)
+        update_record(get_record_by_id(self.record.pk), {"amount": 150})
+        with self.assertRaises(RecordVersionConflict):
+            update_record(stale, {"amount": 200})
+        self.assertEqual(Records.objects.get().amount, 150)
+
+    def test_hierarchy_checked_against_cached_ids(self):
+        other_type = Type.objects.create(title="Пополнение")
+        response = self.patch({"type": other_type.title})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Records.objects.get().type_id, self.type.pk)
+
+
+class BulkUpdateDeleteTests(RecordsTestMixin, TestCase):
+    url = "/api/v1/records/bulk/"
+
+    def setUp(self):
+        self.other_category = Category.objects.create(title="Зарплата", type=self.type)
+        self.other_subcategory = Subcategory.objects.create(title="Премии", category=self.other_category)
+        self.create_records(5, amount=100)
+        self.create_records(2, amount=300, subcategory=self.other_subcategory, category=self.other_category)
+
+    def request(self, method, data=None, query=""):
+        if data is None:
+            return getattr(self.client, method)(self.url + query)
+        return getattr(self.client, method)(self.url + query, data, content_type="application/json")
+
+    def test_patch_by_filters(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.request("patch", {"subcategory": "Премии"}, "?subcategory=Avito")
+        self.assertEqual(response.json(), {"updated": 5})
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "records_records"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Records.objects.filter(category=self.other_category, version=2).count(), 5)
+        self.assertEqual(get_daily_totals_mismatches(), [])
+
+    def test_patch_by_ids_with_amount(self):
+        ids = list(Records.objects.filter(amount=300).values_list("pk", flat=True))
+        self.assertEqual(self.request("patch", {"ids": ids, "amount": 50}).json(), {"updated": 2})
+        self.assertEqual(Records.objects.filter(amount=50).count(), 2)
+        self.assertEqual(get_daily_totals_mismatches(), [])
+        self.assertEqual(get_record_changes()["next"], RecordChange.objects.latest("pk").pk)
+
+    def test_patch_rejects_broken_hierarchy(self):
+        response = self.request("patch", {"category": "Зарплата"}, "?subcategory=Avito")
+        self.assertEqual(response.status_code, 400)
+        response = self.request("patch", {"category": "Маркетинг", "subcategory": "Премии"}, "?subcategory=Avito")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Records.objects.filter(subcategory=self.subcategory).count(), 5)
+
+    def test_delete_by_filters(self):
+        self.assertEqual(self.request("delete", query="?category=Зарплата").json(), {"deleted": 2})
+        self.assertEqual(Records.objects.count(), 5)
+        self.assertEqual(get_daily_totals_mismatches(), [])
+        self.assertEqual(RecordChange.objects.filter(action=RecordChange.DELETE).count(), 2)
+
+    def test_requires_ids_or_filters(self):
+        self.assertEqual(self.request("delete").status_code, 400)
+        self.assertEqual(Records.objects.count(), 7)
+
+    def test_non_filter_params_do_not_scope_request(self):
+        for query in ("?format=json", "?page_size=1", "?cursor=x&q=реклама", "?status="):
+            self.assertEqual(self.request("delete", query=query).status_code, 400, query)
+            self.assertEqual(self.request("patch", {"amount": 1}, query).status_code, 400, query)
+        self.assertEqual(Records.objects.filter(amount__in=[100, 300]).count(), 7)
+
+
+class CommentSearchTests(RecordsTestMixin, TestCase):
+    def setUp(self):
+        self.create_records(1, comment="Оплата рекламы на Авито")
+        self.create_records(1, comment="Реклама, реклама и еще раз реклама")
+        self.create_records(1, comment="Аренда офиса")
+        self.create_records(2, comment="")
+        self.other_status = Status.objects.create(title="Личное")
+        self.create_records(1, comment="Реклама", status=self.other_status)
+
+    def search(self, query):
+        response = self.client.get(f"/api/v1/records/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def comments(self, query):
+        return [record["comment"] for record in self.search(query)["records"]]
+
+    def test_prefix_and_case_insensitive_match(self):
+        self.assertEqual(self.comments("?q=авит"), ["Оплата рекламы на Авито"])
+        self.assertEqual(self.comments("?q=аренда ОФИС"), ["Аренда офиса"])
+        self.assertEqual(self.comments("?q=склад"), [])
+
+    def test_ranked_and_combined_with_filters(self):
+        self.assertEqual(self.comments("?q=реклам&status=Бизнес"),
+                         ["Реклама, реклама и еще раз реклама", "Оплата рекламы на Авито"])
+        self.assertEqual(self.comments("?q=реклам&status=Личное"), ["Реклама"])
+
+    def test_uses_index_not_like(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.search("?q=реклам")
+        sql = " ".join(query["sql"] for query in ctx.captured_queries)
+        self.assertIn("@@" if connection.vendor == "postgresql" else "MATCH", sql)
+        self.assertNotIn("LIKE", sql)
+
+    @skipUnless(connection.vendor == "sqlite", "индекс FTS5 - только на SQLite")
+    def test_sqlite_index_triggers_exist(self):
+        # Без триггеров миграции 0010 индекс не видит новые и измененные записи
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'records_records'")
+            triggers = {row[0] for row in cursor.fetchall()}
+        self.assertLessEqual({"records_records_fts_insert", "records_records_fts_delete",
+                              "records_records_fts_update"}, triggers)
+
+    @skipUnless(connection.vendor == "postgresql", "GIN-индекс - только на PostgreSQL")
+    def test_postgresql_index_matches_search_expression(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'records_comment_search_idx'")
+            row = cursor.fetchone()
+        self.assertIsNotNone(row)
+        self.assertIn("to_tsvector('simple'::regconfig", row[0])
+        query = search_records(Records.objects.all(), "реклам")
+        with connection.cursor() as cursor:
+            sql, params = query.query.sql_with_params()
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn("records_comment_search_idx", plan)
+
+    def test_cursor_pagination(self):
+        first = self.search("?q=реклам&page_size=2")
+        second = self.search(f"?q=реклам&page_size=2&cursor={first['next']}")
+        self.assertIsNone(second["next"])
+        ids = [record["id"] for record in first["records"] + second["records"]]
+        expected = Records.objects.exclude(comment__in=["", "Аренда офиса"]).values_list("pk", flat=True)
+        self.assertEqual(sorted(ids), sorted(expected))
+
+    def test_index_follows_changes(self):
+        record = Records.objects.get(comment="Аренда офиса")
+        update_record(record, {"comment": "Аренда склада"})
+        self.assertEqual(self.comments("?q=склад"), ["Аренда склада"])
+        self.assertEqual(self.comments("?q=офис"), [])
+        delete_record(get_record_by_id(record.pk))
+        self.assertEqual(self.comments("?q=склад"), [])
+
+    def test_export_and_invalid_query(self):
+        response = self.client.get("/api/v1/records/export/?output=ndjson&q=авито")
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)["comment"] for line in lines], ["Оплата рекламы на Авито"])
+        self.assertEqual(self.client.get("/api/v1/records/?q=!!!").status_code, 400)
+
+
+class JobsTests(RecordsTestMixin, TestCase):
+    def setUp(self):
+        self.jobs_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(RECORDS_JOBS_DIR=self.jobs_dir, RECORDS_EXPORT_CHUNK_SIZE=2))
+        self.create_records(5)
+
+    def submit(self, data):
+        response = self.client.post("/api/v1/jobs/", data, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        return response.json()["job"]
+
+    def run_jobs(self):
+        call_command("run_jobs", processes=0, once=True, stdout=io.StringIO())
+
+    def test_export_job(self):
+        job = self.submit({"kind": "export", "output": "csv", "filters": {"status": "Бизнес"}})
+        self.assertEqual(job["status"], "queued")
+        response = self.client.get(f"/api/v1/jobs/{job['id']}/result/")
+        self.assertEqual(response.status_code, 409)
+
+        self.run_jobs()
+        job = self.client.get(f"/api/v1/jobs/{job['id']}/").json()["job"]
+        self.assertEqual((job["status"], job["processed"], job["total"]), ("done", 5, 5))
+        self.assertEqual(job["result"], {"records": 5})
+        response = self.client.get(job["result_url"])
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content, self.client.get("/api/v1/records/export/?output=csv").getvalue().decode())
+
+    def test_import_job(self):
+        row = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг", "subcategory": "Avito", "amount": 7}
+        body = "\n".join([json.dumps(row)] * 3 + ["{}", "not json", ""]).encode()
+        response = self.client.post("/api/v1/jobs/import/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 202)
+
+        self.run_jobs()
+        job = Job.objects.get(pk=response.json()["job"]["id"])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result["created"], 3)
+        self.assertEqual([error["index"] for error in job.result["errors"]], [3, 4])
+        self.assertEqual(Records.objects.filter(amount=7).count(), 3)
+        self.assertEqual(get_daily_totals_mismatches(), [])
+
+    def test_strict_import_saves_nothing_on_error(self):
+        row = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг", "subcategory": "Avito", "amount": 7}
+        body = "\n".join([json.dumps(row), json.dumps({**row, "amount": 0})]).encode()
+        self.client.post("/api/v1/jobs/import/?strict=1", body, content_type="application/x-ndjson")
+        self.run_jobs()
+        self.assertEqual(Job.objects.get().result["created"], 0)
+        self.assertEqual(Records.objects.filter(amount=7).count(), 0)
+
+    def test_rebuild_daily_totals_job(self):
+        DailyTotals.objects.all().delete()
+        job = self.submit({"kind": "rebuild_daily_totals"})
+        self.run_jobs()
+        self.assertEqual(Job.objects.get(pk=job["id"]).status, Job.DONE)
+        self.assertEqual(get_daily_totals_mismatches(), [])
+
+    def test_failed_job_keeps_error(self):
+        job = Job.objects.create(kind=Job.EXPORT, params={"filters": {"date_from": "not a date"}})
+        with self.assertLogs("records.jobs", level="ERROR"):
+            self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("ValidationError", job.error)
+
+    def test_job_is_claimed_once(self):
+        job = Job.objects.create(kind=Job.REBUILD_DAILY_TOTALS)
+        self.assertTrue(claim_job(job.pk))
+        self.assertFalse(claim_job(job.pk))
+
+    def test_rejects_bad_submissions(self):
+        for data in ({"kind": "unknown"}, {"kind": "export", "output": "xml"},
+                     {"kind": "export", "filters": {"type_id": "x"}}):
+            response = self.client.post("/api/v1/jobs/", data, content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/jobs/999/").status_code, 404)
+
+
+@skipUnless(connection.vendor == "sqlite", "профиль SQLite")
+class SQLiteProfileTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"])
+        self.assertEqual(self.pragma("cache_size"), settings.SQLITE_PRAGMAS["cache_size"])
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_wsgi_request(self):
+        application = WSGIHandler()
+        self.assertEqual(wsgi_request(application, "GET", "/api/v1/records/"), 200)
+        self.assertEqual(wsgi_request(application, "GET", "/api/v1/records/missing/"), 404)
+
+
+@override_settings(RECORDS_REPLICA_DATABASE="replica")
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    # SimpleTestCase: без транзакции TestCase, которая сама закрепляет чтения за основным сервером
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Records), "replica")
+        self.assertEqual(self.router.db_for_write(Records), "default")
+        self.assertFalse(self.router.allow_migrate("replica", "records"))
+
+    def test_other_apps_are_not_routed(self):
+        self.assertIsNone(self.router.db_for_read(Session))
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertIsNone(self.router.db_for_read(Job))
+
+    def test_any_records_write_pins_request(self):
+        with primary_pinning():
+            self.router.db_for_write(Session)
+            self.assertEqual(self.router.db_for_read(Records), "replica")
+            self.router.db_for_write(Records)
+            self.assertEqual(self.router.db_for_read(Records), "default")
+
+    @override_settings(RECORDS_REPLICA_DATABASE=None)
+    def test_without_replica(self):
+        self.assertIsNone(self.router.db_for_read(Records))
+
+    def test_write_pins_request_to_primary(self):
+        with primary_pinning() as state:
+            self.assertEqual(self.router.db_for_read(Records), "replica")
+            pin_to_primary()
+            self.assertEqual(self.router.db_for_read(Records), "default")
+        self.assertTrue(state["written"])
+        self.assertEqual(self.router.db_for_read(Records), "replica")
+
+    def test_cookie_keeps_client_on_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Records))
+            if request.method == "POST":
+                pin_to_primary()
+            return HttpResponse()
+
+        middleware = PrimaryStickinessMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.post("/"))
+        cookie = response.cookies[PRIMARY_COOKIE].value
+        middleware(factory.get("/"))
+        request = factory.get("/")
+        request.COOKIES[PRIMARY_COOKIE] = cookie
+        middleware(request)
+        request.COOKIES[PRIMARY_COOKIE] = "0"
+        middleware(request)
+        self.assertEqual(seen, ["replica", "replica", "default", "replica"])
+
+
+# Маршруты ASGI-режима (RECORDS_ASYNC_VIEWS) для AsyncViewsTests
+urlpatterns = [
+    path("api/v1/records/", csrf_exempt(AsyncRecordsView.as_view())),
+    path("api/v1/records/export/", AsyncExportRecordsView.as_view()),
+    path("api/v1/records/<int:pk>/", csrf_exempt(AsyncRecordDetailView.as_view()), name="records-detail"),
+]
+
+
+@override_settings(ROOT_URLCONF="records.tests")
+class AsyncViewsTests(RecordsTestMixin, TransactionTestCase):
+    # Выгрузка читает базу из потоков общего пула (run_in_db_thread)
+    # со своими соединениями: данные теста должны быть зафиксированы
+    def setUp(self):
+        self.setUpTestData()
+        self.create_records(3, amount=100)
+
+    async def test_list_matches_sync_view(self):
+        response = await self.async_client.get("/api/v1/records/?page_size=2")
+        data = response.json()
+        self.assertEqual(len(data["records"]), 2)
+        rows = await sync_to_async(get_records_page)(Records.objects.all(), page_size=2)
+        self.assertEqual(data["records"], json.loads(dumps(serialize_record_rows(rows[0]))))
+        self.assertEqual(data["next"], rows[1])
+
+    async def test_conditional_get(self):
+        response = await self.async_client.get("/api/v1/records/")
+        etag = response.headers["ETag"]
+        self.assertIn("Last-Modified", response.headers)
+        response = await self.async_client.get("/api/v1/records/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_detail_get_and_delegated_patch(self):
+        pk = await Records.objects.values_list("pk", flat=True).afirst()
+        response = await self.async_client.get(f"/api/v1/records/{pk}/")
+        self.assertEqual(response.json()["record"]["subcategory"], "Avito")
+        response = await self.async_client.patch(f"/api/v1/records/{pk}/", {"amount": 5},
+                                                 content_type="application/json")
+        self.assertEqual(response.json()["record"]["version"], 2)
+
+    async def test_delegated_post(self):
+        data = {"status": "Бизнес", "type": "Списание", "category": "Маркетинг", "subcategory": "Avito",
+                "amount": 10}
+        response = await self.async_client.post("/api/v1/records/", data, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await Records.objects.acount(), 4)
+
+    async def test_export_streams_asynchronously(self):
+        response = await self.async_client.get("/api/v1/records/export/?output=csv")
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(body.splitlines()), 4)
+
+    async def test_metrics_count_queries_of_async_view(self):
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+        await self.async_client.get("/api/v1/records/")
+        await self.async_client.get("/api/v1/records/")
+        body = "\n".join(DB_QUERIES.render() + DB_DURATION.render())
+        # Версия таблицы и страница записей - в потоках sync_to_async, а не в потоке event loop
+        self.assertIn('dds_db_queries_sum{route="api/v1/records/",method="GET"} 4', body)
+        self.assertNotIn('dds_db_duration_seconds_sum{route="api/v1/records/",method="GET"} 0.0\n', body + "\n")
+
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_slow_export_clients_share_db_threads(self):
+        if not settings.RECORDS_ASYNC_DB_THREADS:
+            self.skipTest("RECORDS_ASYNC_DB_THREADS = 0: чтение в потоке запроса")
+        application = ASGIHandler()
+        clients = settings.RECORDS_ASYNC_DB_THREADS * 4
+        threads = set()
+
+        def on_connection(sender, **kwargs):
+            threads.add(threading.current_thread().name)
+
+        async def run():
+            # Каждый клиент читает ответ со скоростью 1 КБ/с и держит запрос открытым ~0.1 с
+            return await asyncio.gather(*(
+                asgi_request(application, "GET", "/api/v1/records/export/", bandwidth=1000) for _ in range(clients)
+            ))
+
+        connection_created.connect(on_connection)
+        try:
+            codes = asyncio.run(run())
+        finally:
+            connection_created.disconnect(on_connection)
+        self.assertEqual(codes, [200] * clients)
+        # Соединения открываются только в потоках пула run_in_db_thread, а не на каждого клиента
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith("records-db") for name in threads), threads)
+        self.assertLessEqual(len(threads), settings.RECORDS_ASYNC_DB_THREADS)
+
+
+@override_settings(ALLOWED_HOSTS=["localhost"])
+class AsgiRequestTests(SimpleTestCase):
+    @override_settings(DEBUG=True)
+    def test_middleware_is_not_adapted_to_sync(self):
+        # С DEBUG Django пишет в лог каждую middleware, которую пришлось обернуть в sync_to_async
+        with self.assertNoLogs("django.request", level="DEBUG"):
+            application = ASGIHandler()
+        self.assertEqual(async_to_sync(asgi_request)(application, "GET", "/metrics"), 200)
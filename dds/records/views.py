@@ -1,19 +1,152 @@
 import datetime
+import functools
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views import View
+from django.views.decorators.http import condition
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
 
 from rest_framework.response import Response
 from rest_framework import viewsets, views
 from rest_framework.views import APIView
 from unicodedata import category
 
-from records.models import Records, Type, Status, Category, Subcategory
+from records import clock
+from records.jobs import get_job_path, save_job_upload
+from records.models import Records, Type, Status, Category, Subcategory, Job
 from records.serializers import RecordsSerializer, TypeSerializer, StatusSerializer, CategorySerializer, \
-    SubcategorySerializer
-from records.selectors import get_record_by_id, get_filtered_records
-from records.services import create_record, update_record, delete_record
+    SubcategorySerializer, JobSerializer, serialize_record_rows
+from records.export import EXPORT_FORMATS, ASYNC_EXPORT_FORMATS
+from records.pagination import get_page_size
+from records.parsers import NDJSONParser
+from records.renderers import FastJSONRenderer, dumps
+from records.selectors import (get_record_by_id, get_filtered_records, get_records_page, iter_records_rows,
+                               get_records_report, get_filtered_daily_totals, get_table_version, get_record_changes,
+                               invalidate_reference_data, aget_records_page, aiter_records_rows, aget_table_version,
+                               aget_record_by_id, get_job_by_id, search_records, get_reference_tree,
+                               get_reference_children, REFERENCE_TREE_TABLE)
+from records.services import (create_record, update_record, delete_record, build_record, bulk_create_records,
+                              bulk_update_records, bulk_delete_records, RecordVersionConflict, submit_job)
+
+
+def error_message(e: ValidationError) -> str:
+    """
+    Текст ошибки ValidationError для ответа API
+
+    e.message - шаблон без подставленных значений ("%(value)s ..."),
+    а e.messages - готовые сообщения, в том числе для ошибок по полям.
+    """
+    return " ".join(e.messages)
+
+
+# Параметры запроса, которые фильтруют записи (см. parse_filter_params)
+FILTER_PARAMS = ("date_from", "date_to", "status", "type", "category", "subcategory",
+                 "status_id", "type_id", "category_id", "subcategory_id")
+
+
+def get_filter_params(request) -> dict:
+    """
+    Собирает параметры get_filtered_records из query parameters запроса
+    или выкидывает ошибку ValidationError, если ID элемента справочника не является числом
+
+    date_to по умолчанию - дата запроса (request.today из RequestClockMiddleware).
+
+    Принимает:
+        request: Request - запрос DRF или HttpRequest
+
+    Возвращает:
+        dict - именованные аргументы для get_filtered_records
+    """
+    return parse_filter_params(request.GET, getattr(request, "today", None) or clock.today())
+
+
+def parse_filter_params(query_params, today: datetime.date) -> dict:
+    """
+    Собирает параметры get_filtered_records из словаря фильтров
+    или выкидывает ошибку ValidationError, если ID элемента справочника не является числом
+
+    Принимает:
+        query_params: Mapping - фильтры GET /api/v1/records/
+        today: date - значение date_to по умолчанию
+
+    Возвращает:
+        dict - именованные аргументы для get_filtered_records
+    """
+    params = {
+        "date_from": query_params.get("date_from"),
+        "date_to": query_params.get("date_to") or today,
+        "status": query_params.get("status"),
+        "type": query_params.get("type"),
+        "category": query_params.get("category"),
+        "subcategory": query_params.get("subcategory"),
+    }
+    for name in ("status_id", "type_id", "category_id", "subcategory_id"):
+        value = query_params.get(name)
+        if value:
+            try:
+                params[name] = int(value)
+            except (TypeError, ValueError):
+                raise ValidationError(f"Invalid {name}")
+    return params
+
+
+def get_records_query(request):
+    """
+    Возвращает записи по фильтрам из query parameters запроса,
+    а если передан q - еще и по полнотекстовому поиску в комментарии (см. search_records)
+
+    Принимает:
+        request: Request - запрос DRF или HttpRequest
+
+    Возвращает:
+        QuerySet[Records]
+    """
+    query = get_filtered_records(**get_filter_params(request))
+    q = request.GET.get("q", "").strip()
+    if q:
+        query = search_records(query, q)
+    return query
+
+
+def table_version_etag(request, name: str, version: int) -> str:
+    """
+    ETag ответа по счетчику изменений таблицы и дате запроса
+    """
+    return f"{name}-{version}-{getattr(request, 'today', '')}"
+
+
+def table_version_condition(name: str):
+    """
+    Декоратор условного GET по счетчику изменений таблицы (TableVersion)
+
+    Отвечает 304 на If-None-Match / If-Modified-Since, выполнив только запрос
+    версии таблицы, без основного запроса и сериализации.
+    Дата запроса входит в ETag, так как date_to по умолчанию - сегодня.
+
+    Принимает:
+        name: str - имя таблицы, например "records"
+    """
+    def get_version(request):
+        if not hasattr(request, "_table_version"):
+            request._table_version = get_table_version(name)
+        return request._table_version
+
+    def etag(request, *args, **kwargs):
+        return table_version_etag(request, name, get_version(request)[0])
+
+    def last_modified(request, *args, **kwargs):
+        return get_version(request)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
 
 
 class ReadCreateRecordsAPIView(views.APIView):
@@ -24,10 +157,15 @@ class ReadCreateRecordsAPIView(views.APIView):
         - GET: Получение отфильтрованного списка записей
         - POST: Создание новой записи
     """
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    @method_decorator(table_version_condition("records"))
     def get(self, request):
         """
             Возвращает отфильтрованный список финансовых записей.
 
+            Поддерживает условный GET (ETag / Last-Modified).
+
             Параметры запроса (query parameters):
                 date_from (date, optional): Начальная дата периода
                 date_to (date, optional): Конечная дата периода. По умолчанию: сегодня
@@ -35,16 +173,29 @@ class ReadCreateRecordsAPIView(views.APIView):
                 type (str, optional): Фильтр по типу операции
                 category (str, optional): Фильтр по категории
                 subcategory (str, optional): Фильтр по подкатегории
+                status_id, type_id, category_id, subcategory_id (int, optional):
+                    Фильтры по ID элементов справочника
+                q (str, optional): Поиск по словам (и их началу) в комментарии;
+                    записи сортируются по релевантности
+                cursor (str, optional): Токен next с предыдущей страницы
+                page_size (int, optional): Размер страницы, не больше RECORDS_MAX_PAGE_SIZE
+
+            Возвращает:
+            Response: {
+                "records": [...],
+                "next": "MjAyMy0wMS0xNXw0Mg"  # None на последней странице
+            }
             """
-        query = get_filtered_records(
-            date_from=request.query_params.get("date_from"),
-            date_to=request.query_params.get("date_to", datetime.date.today()),
-            status=request.query_params.get("status"),
-            type=request.query_params.get("type"),
-            category=request.query_params.get("category"),
-            subcategory=request.query_params.get("subcategory"),
-        )
-        return Response({'records': RecordsSerializer(query, many=True).data})
+        try:
+            query = get_records_query(request)
+            rows, next_cursor = get_records_page(
+                query,
+                cursor=request.query_params.get("cursor"),
+                page_size=get_page_size(request.query_params.get("page_size")),
+            )
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=400)
+        return Response({'records': serialize_record_rows(rows), 'next': next_cursor})
 
     def post(self, request):
         """
@@ -74,11 +225,236 @@ class ReadCreateRecordsAPIView(views.APIView):
         try:
             new_record = create_record(serializer.validated_data)
         except ValidationError as e:
-            return Response({'error': e.message}, status=400)
+            return Response({'error': error_message(e)}, status=400)
 
         return Response({'record': RecordsSerializer(new_record).data})
 
 
+class RecordChangesAPIView(views.APIView):
+    """
+    API endpoint для синхронизации локальных копий записей
+    /api/v1/records/changes/
+    Поддерживает:
+    - GET: Записи, созданные, измененные и удаленные после токена since
+    """
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    def get(self, request):
+        """
+        Возвращает изменения записей после токена since
+
+        Параметры запроса (query parameters):
+            since (int, optional): Токен next из предыдущего ответа. По умолчанию: 0 (все записи)
+            page_size (int, optional): Сколько изменений прочитать, не больше RECORDS_MAX_PAGE_SIZE
+
+        Возвращает:
+            Response: {
+                "records": [...],       # текущее состояние созданных и измененных записей
+                "deleted": [12, 40],    # ID удаленных записей
+                "next": 1532,           # токен для следующего запроса
+                "has_more": false       # есть ли еще изменения после next
+            }
+        """
+        try:
+            since = int(request.query_params.get("since", 0))
+            changes = get_record_changes(since, get_page_size(request.query_params.get("page_size")))
+        except ValueError:
+            return Response({'error': 'Invalid since'}, status=400)
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=400)
+        changes["records"] = serialize_record_rows(changes["records"])
+        return Response(changes)
+
+
+class ExportRecordsAPIView(views.APIView):
+    """
+    API endpoint для выгрузки записей операций
+    /api/v1/records/export/
+    Поддерживает:
+    - GET: Потоковая выгрузка отфильтрованных записей в CSV или NDJSON
+    """
+    def get(self, request):
+        """
+        Отдает отфильтрованные записи потоком, не собирая выгрузку в памяти
+
+        Параметры запроса (query parameters):
+            output (str, optional): "csv" или "ndjson". По умолчанию: csv
+            а также все фильтры GET /api/v1/records/
+        """
+        output = request.query_params.get("output", "csv")
+        if output not in EXPORT_FORMATS:
+            return Response({'error': 'Unsupported output format'}, status=400)
+        try:
+            query = get_records_query(request)
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=400)
+
+        stream, content_type = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(stream(iter_records_rows(query)), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="records.{output}"'
+        return response
+
+
+class RecordsReportAPIView(views.APIView):
+    """
+    API endpoint для отчетов по записям операций
+    /api/v1/reports/
+    Поддерживает:
+    - GET: Суммы и количество записей по периодам и элементам справочника
+    """
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    def get(self, request):
+        """
+        Возвращает суммы и количество отфильтрованных записей, посчитанные базой данных
+
+        Если включен RECORDS_REPORTS_USE_DAILY_TOTALS, отчет читается из
+        предрасчитанных сумм за день вместо таблицы записей.
+
+        Параметры запроса (query parameters):
+            period (str, optional): "day", "week", "month" или "year"
+            group_by (str, optional): Список через запятую из type, status, category, subcategory
+            а также все фильтры GET /api/v1/records/
+
+        Возвращает:
+            Response: {
+                "report": {
+                    "period": ["2023-01-01", "2023-02-01"],
+                    "type": ["Списание", "Списание"],
+                    "total": [15000, 4200],
+                    "count": [12, 3]
+                }
+            }
+        """
+        group_by = [field for field in request.query_params.get("group_by", "").split(",") if field]
+        try:
+            params = get_filter_params(request)
+            if settings.RECORDS_REPORTS_USE_DAILY_TOTALS:
+                query = get_filtered_daily_totals(**params)
+            else:
+                query = get_filtered_records(**params)
+            report = get_records_report(query, period=request.query_params.get("period"), group_by=group_by)
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=400)
+        return Response({'report': report})
+
+
+def get_bulk_records(request):
+    """
+    Возвращает записи для массовой операции: по списку ids из тела запроса
+    или по фильтрам GET /api/v1/records/ из параметров запроса
+
+    Без ids и без хотя бы одного фильтра из FILTER_PARAMS выкидывает ValidationError,
+    чтобы случайный запрос не затронул все записи: прочие параметры
+    (format, page_size и т.п.) фильтром не считаются.
+
+    Возвращает:
+        QuerySet[Records]
+    """
+    ids = request.data.get("ids") if isinstance(request.data, dict) else None
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            raise ValidationError("ids must be a list of integers")
+        return Records.objects.filter(pk__in=ids)
+    if not any(request.query_params.get(name) for name in FILTER_PARAMS):
+        raise ValidationError(f"Specify ids or at least one filter: {', '.join(FILTER_PARAMS)}")
+    return get_filtered_records(**get_filter_params(request))
+
+
+class BulkRecordsAPIView(views.APIView):
+    """
+    API endpoint для массовых операций с записями
+    /api/v1/records/bulk/
+    Поддерживает:
+    - POST: Создание записей из JSON-массива или NDJSON-потока
+    - PATCH: Изменение записей по списку ID или фильтрам
+    - DELETE: Удаление записей по списку ID или фильтрам
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        """
+        Проверяет все строки за один проход и сохраняет корректные пачками в одной транзакции
+
+        Тело запроса: JSON-массив (application/json) или NDJSON (application/x-ndjson)
+        из объектов в формате POST /api/v1/records/
+
+        Параметры запроса (query parameters):
+            strict (bool, optional): Если true, при любой ошибке ничего не сохраняется
+
+        Возвращает:
+            Response: {
+                "created": 998,
+                "errors": [{"index": 3, "error": ...}, ...]
+            }
+        """
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of records'}, status=400)
+        strict = request.query_params.get("strict", "").lower() in ("1", "true", "yes")
+
+        records, errors = [], []
+        for index, row in enumerate(request.data):
+            serializer = RecordsSerializer(data=row)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'error': serializer.errors})
+                continue
+            try:
+                records.append(build_record(serializer.validated_data))
+            except ValidationError as e:
+                errors.append({'index': index, 'error': error_message(e)})
+
+        if strict and errors:
+            return Response({'created': 0, 'errors': errors}, status=400)
+        created = bulk_create_records(records)
+        return Response({'created': len(created), 'errors': errors})
+
+    def patch(self, request):
+        """
+        Изменяет выбранные записи одним набором UPDATE в одной транзакции
+
+        Тело запроса (JSON):
+            {
+                "ids": [1, 2, 3],          # необязательное, иначе - фильтры из параметров
+                "category": "Маркетинг",   # любые поля записи, кроме даты;
+                "subcategory": "Avito"     # категорию и тип меняют вместе с подкатегорией
+            }
+
+        Параметры запроса (query parameters):
+            фильтры GET /api/v1/records/, если в теле нет ids
+
+        Возвращает:
+            Response: {"updated": 120}
+        """
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object'}, status=400)
+        data = {key: value for key, value in request.data.items() if key not in ("ids", "version")}
+        serializer = RecordsSerializer(data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        try:
+            updated = bulk_update_records(get_bulk_records(request), serializer.validated_data)
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=400)
+        return Response({'updated': updated})
+
+    def delete(self, request):
+        """
+        Удаляет выбранные записи в одной транзакции
+
+        Тело запроса (JSON, необязательное): {"ids": [1, 2, 3]}
+
+        Параметры запроса (query parameters):
+            фильтры GET /api/v1/records/, если в теле нет ids
+
+        Возвращает:
+            Response: {"deleted": 120}
+        """
+        try:
+            deleted = bulk_delete_records(get_bulk_records(request))
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=400)
+        return Response({'deleted': deleted})
+
+
 class RetrieveDetailRecordAPIView(views.APIView):
     """
     API endpoint для получения, обновления, удаления записей операций
@@ -89,10 +465,13 @@ class RetrieveDetailRecordAPIView(views.APIView):
     PATCH - частичное обновление
     DELETE - удаление записи
     """
+    @method_decorator(table_version_condition("records"))
     def get(self, request, *args, **kwargs):
         """
         Получение конкретной записи по ключу
 
+        Поддерживает условный GET (ETag / Last-Modified).
+
         Возвращает:
             Response: {
                 "record": {
@@ -107,7 +486,7 @@ class RetrieveDetailRecordAPIView(views.APIView):
             try:
                 query = get_record_by_id(pk)
             except ValidationError as e:
-                return Response({'error': e.message})
+                return Response({'error': error_message(e)})
             return Response({'record': RecordsSerializer(query).data})
 
     def put(self, request, partial=False, *args, **kwargs):
@@ -116,7 +495,8 @@ class RetrieveDetailRecordAPIView(views.APIView):
 
         Принимает pk объекта, если такого объекта не существует, выкидывает исключение
 
-        Требует всех полей записи
+        Требует всех полей записи. Если передано поле version и запись
+        уже изменена другим запросом, возвращает 409 с текущей записью.
 
         Возвращает:
             Response: {
@@ -132,14 +512,21 @@ class RetrieveDetailRecordAPIView(views.APIView):
         try:
             instance = get_record_by_id(pk)
         except ValidationError as e:
-            return Response({'error': e.message}, status=400)
+            return Response({'error': error_message(e)}, status=400)
 
         serializer = RecordsSerializer(data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
         try:
-            record = update_record(instance, serializer.validated_data)
+            record = update_record(instance, data, version=data.pop("version", None))
+        except RecordVersionConflict as e:
+            try:
+                current = RecordsSerializer(get_record_by_id(pk)).data
+            except ValidationError:
+                current = None
+            return Response({'error': e.message, 'record': current}, status=409)
         except ValidationError as e:
-            return Response({'error': e.message}, status=400)
+            return Response({'error': error_message(e)}, status=400)
         return Response({'record': RecordsSerializer(record).data})
 
     def patch(self, request, *args, **kwargs):
@@ -162,13 +549,231 @@ class RetrieveDetailRecordAPIView(views.APIView):
         try:
             instance = get_record_by_id(pk)
         except ValidationError as e:
-            return Response({'error': e.message}, status=400)
+            return Response({'error': error_message(e)}, status=400)
         res = delete_record(instance)
         return Response(res)
 
 
 
-class TypeViewSet(viewsets.ModelViewSet):
+class JobsAPIView(views.APIView):
+    """
+    API endpoint для фоновых задач
+    /api/v1/jobs/
+    Поддерживает:
+    - POST: Постановка выгрузки или пересборки сумм за день в очередь
+    """
+    def post(self, request):
+        """
+        Ставит задачу в очередь команды run_jobs и сразу отвечает 202
+
+        Тело запроса (JSON):
+            {
+                "kind": "export",          # или "rebuild_daily_totals"
+                "output": "csv",           # для export: "csv" или "ndjson"
+                "filters": {"date_from": "2023-01-01", "type": "Списание"}
+                                           # для export: фильтры GET /api/v1/records/
+            }
+
+        Возвращает:
+            Response: {
+                "job": {"id": 7, "kind": "export", "status": "queued", ...}
+            }
+        """
+        data = request.data if isinstance(request.data, dict) else {}
+        kind = data.get("kind")
+        if kind == Job.EXPORT:
+            output = data.get("output", "csv")
+            if output not in EXPORT_FORMATS:
+                return Response({'error': 'Unsupported output format'}, status=400)
+            filters = data.get("filters") or {}
+            if not isinstance(filters, dict):
+                return Response({'error': 'filters must be an object'}, status=400)
+            try:
+                # date_to фиксируется при постановке, а не при выполнении задачи
+                filters = parse_filter_params(filters, getattr(request, "today", None) or clock.today())
+                get_filtered_records(**filters)
+            except ValidationError as e:
+                return Response({'error': error_message(e)}, status=400)
+            params = {"output": output, "filters": {k: v for k, v in filters.items() if v is not None}}
+        elif kind == Job.REBUILD_DAILY_TOTALS:
+            params = {}
+        else:
+            return Response({'error': 'Unsupported job kind'}, status=400)
+        job = submit_job(kind, params)
+        return Response({'job': JobSerializer(job).data}, status=202)
+
+
+class ImportJobAPIView(views.APIView):
+    """
+    API endpoint для фоновой загрузки записей
+    /api/v1/jobs/import/
+    Поддерживает:
+    - POST: Сохранение NDJSON-файла и постановка загрузки в очередь
+    """
+    def post(self, request):
+        """
+        Сохраняет тело запроса в RECORDS_JOBS_DIR и ставит загрузку в очередь
+
+        Тело запроса: NDJSON (application/x-ndjson) из объектов в формате POST /api/v1/records/
+
+        Параметры запроса (query parameters):
+            strict (bool, optional): Если true, при любой ошибке ничего не сохраняется
+
+        Возвращает:
+            Response: {
+                "job": {"id": 8, "kind": "import", "status": "queued", ...}
+            }
+        """
+        if request.content_type.split(";")[0].strip() != NDJSONParser.media_type:
+            return Response({'error': f'Expected {NDJSONParser.media_type}'}, status=415)
+        stream = request.stream
+        if stream is None:
+            return Response({'error': 'Empty body'}, status=400)
+        source = save_job_upload(iter(lambda: stream.read(64 * 1024), b""))
+        strict = request.query_params.get("strict", "").lower() in ("1", "true", "yes")
+        job = submit_job(Job.IMPORT, {"source": source, "strict": strict})
+        return Response({'job': JobSerializer(job).data}, status=202)
+
+
+class JobDetailAPIView(views.APIView):
+    """
+    API endpoint для состояния фоновой задачи
+    /api/v1/jobs/<int:pk>/
+    Поддерживает:
+    - GET: Состояние, прогресс и итог задачи
+    """
+    def get(self, request, pk):
+        """
+        Возвращает:
+            Response: {
+                "job": {
+                    "id": 7,
+                    "status": "running",
+                    "processed": 40000,
+                    "total": 100000,
+                    "result_url": None,    # ссылка на файл, когда задача выполнена
+                    ...
+                }
+            }
+        """
+        try:
+            job = get_job_by_id(pk)
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=404)
+        return Response({'job': JobSerializer(job).data})
+
+
+class JobResultAPIView(views.APIView):
+    """
+    API endpoint для файла результата фоновой задачи
+    /api/v1/jobs/<int:pk>/result/
+    Поддерживает:
+    - GET: Скачивание файла выполненной задачи
+    """
+    def get(self, request, pk):
+        """
+        Отдает файл результата потоком
+
+        Если задача еще не выполнена, возвращает 409 с ее состоянием.
+        """
+        try:
+            job = get_job_by_id(pk)
+        except ValidationError as e:
+            return Response({'error': error_message(e)}, status=404)
+        if job.status != Job.DONE:
+            return Response({'error': 'Job is not finished', 'job': JobSerializer(job).data}, status=409)
+        path = get_job_path(job.result_file) if job.result_file else None
+        if path is None or not path.is_file():
+            return Response({'error': 'Job has no result file'}, status=404)
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=job.result_file)
+
+
+class ReferenceTreeAPIView(views.APIView):
+    """
+    API endpoint для дерева справочника
+    /api/v1/tree/
+    Поддерживает:
+    - GET: Типы операций с вложенными категориями и подкатегориями
+    """
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    @method_decorator(table_version_condition(REFERENCE_TREE_TABLE))
+    def get(self, request):
+        """
+        Возвращает все дерево Тип -> Категория -> Подкатегория одним ответом
+
+        Дерево берется из кэша справочника без запросов к базе, кроме версии
+        дерева для условного GET (ETag / Last-Modified).
+
+        Возвращает:
+            Response: {
+                "tree": [
+                    {"id": 1, "title": "Списание", "categories": [
+                        {"id": 3, "title": "Маркетинг", "subcategories": [{"id": 7, "title": "Avito"}]}
+                    ]}
+                ]
+            }
+        """
+        # Версию уже прочитал table_version_condition
+        return Response({'tree': get_reference_tree(request._table_version[0])})
+
+
+class ReferenceChildrenAPIView(views.APIView):
+    """
+    API endpoint для дочерних элементов дерева справочника
+    /api/v1/tree/children/
+    Поддерживает:
+    - GET: Категории типа операции (?type=<id>) или подкатегории категории (?category=<id>)
+
+    Используется связанными списками формы записи в админ-панели.
+    """
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    @method_decorator(table_version_condition(REFERENCE_TREE_TABLE))
+    def get(self, request):
+        """
+        Возвращает дочерние элементы родителя из кэша справочника
+
+        Query Parameters:
+            type (int): ID типа операции - вернуть его категории
+            category (int): ID категории - вернуть ее подкатегории
+
+        Возвращает:
+            Response: {
+                "results": [{"id": 3, "title": "Маркетинг"}]
+            }
+        """
+        parents = [name for name in ("type", "category") if request.query_params.get(name)]
+        if len(parents) != 1:
+            return Response({'error': 'Exactly one of type, category is required'}, status=400)
+        try:
+            pk = int(request.query_params[parents[0]])
+        except ValueError:
+            return Response({'error': f'Invalid {parents[0]}'}, status=400)
+        children = get_reference_children(parents[0], pk, request._table_version[0])
+        return Response({'results': children})
+
+
+class ReferenceDataViewSetMixin:
+    """
+    Сбрасывает закэшированный справочник после изменений через API
+    """
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_reference_data()
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_reference_data()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_reference_data()
+
+
+@method_decorator(table_version_condition("type"), name="list")
+@method_decorator(table_version_condition("type"), name="retrieve")
+class TypeViewSet(ReferenceDataViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet для модели Type (операции CRUD)
     """
@@ -176,7 +781,9 @@ class TypeViewSet(viewsets.ModelViewSet):
     serializer_class = TypeSerializer
 
 
-class StatusViewSet(viewsets.ModelViewSet):
+@method_decorator(table_version_condition("status"), name="list")
+@method_decorator(table_version_condition("status"), name="retrieve")
+class StatusViewSet(ReferenceDataViewSetMixin, viewsets.ModelViewSet):
     """
         ViewSet для модели Status (операции CRUD)
     """
@@ -184,7 +791,9 @@ class StatusViewSet(viewsets.ModelViewSet):
     serializer_class = StatusSerializer
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+@method_decorator(table_version_condition("category"), name="list")
+@method_decorator(table_version_condition("category"), name="retrieve")
+class CategoryViewSet(ReferenceDataViewSetMixin, viewsets.ModelViewSet):
     """
         ViewSet для модели Category (операции CRUD)
 
@@ -194,10 +803,111 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
 
-class SubcategoryViewSet(viewsets.ModelViewSet):
+@method_decorator(table_version_condition("subcategory"), name="list")
+@method_decorator(table_version_condition("subcategory"), name="retrieve")
+class SubcategoryViewSet(ReferenceDataViewSetMixin, viewsets.ModelViewSet):
     """
         ViewSet для модели Subcategory (операции CRUD)
 
     """
     queryset = Subcategory.objects.all()
     serializer_class = SubcategorySerializer
+
+
+# Асинхронный путь для ASGI (RECORDS_ASYNC_VIEWS): список и запись читаются async ORM
+# Django, выгрузка - пачками в общем пуле из RECORDS_ASYNC_DB_THREADS потоков
+# (run_in_db_thread), чтобы медленные клиенты не держали соединения с базой.
+# DRF не поддерживает async, поэтому изменения передаются синхронным APIView.
+
+def json_response(data, status=200) -> HttpResponse:
+    return HttpResponse(dumps(data), content_type="application/json", status=status)
+
+
+def async_table_version_condition(name: str):
+    """
+    Асинхронный вариант table_version_condition для методов async-представлений
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def inner(self, request, *args, **kwargs):
+            version, updated_at = await aget_table_version(name)
+            etag = quote_etag(table_version_etag(request, name, version))
+            last_modified = int(updated_at.timestamp()) if updated_at else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await method(self, request, *args, **kwargs)
+                if not response.has_header("ETag"):
+                    response.headers["ETag"] = etag
+                if last_modified and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(last_modified)
+            return response
+        return inner
+    return decorator
+
+
+class AsyncRecordsView(View):
+    """
+    Асинхронный /api/v1/records/
+    - GET: как ReadCreateRecordsAPIView.get
+    - POST: передается ReadCreateRecordsAPIView
+    """
+    sync_view = staticmethod(ReadCreateRecordsAPIView.as_view())
+
+    @async_table_version_condition("records")
+    async def get(self, request):
+        try:
+            query = await sync_to_async(get_records_query)(request)
+            rows, next_cursor = await aget_records_page(
+                query,
+                cursor=request.GET.get("cursor"),
+                page_size=get_page_size(request.GET.get("page_size")),
+            )
+        except ValidationError as e:
+            return json_response({'error': error_message(e)}, status=400)
+        return json_response({'records': serialize_record_rows(rows), 'next': next_cursor})
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+
+class AsyncRecordDetailView(View):
+    """
+    Асинхронный /api/v1/records/<int:pk>/
+    - GET: как RetrieveDetailRecordAPIView.get
+    - PUT, PATCH, DELETE: передаются RetrieveDetailRecordAPIView
+    """
+    sync_view = staticmethod(RetrieveDetailRecordAPIView.as_view())
+
+    @async_table_version_condition("records")
+    async def get(self, request, pk):
+        try:
+            record = await aget_record_by_id(pk)
+        except ValidationError as e:
+            return json_response({'error': error_message(e)})
+        return json_response({'record': RecordsSerializer(record).data})
+
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    patch = delete = put
+
+
+class AsyncExportRecordsView(View):
+    """
+    Асинхронный /api/v1/records/export/
+    - GET: как ExportRecordsAPIView.get; строки читаются пачками (aiter_records_rows),
+      медленный клиент не держит соединение с базой
+    """
+    async def get(self, request):
+        output = request.GET.get("output", "csv")
+        if output not in ASYNC_EXPORT_FORMATS:
+            return json_response({'error': 'Unsupported output format'}, status=400)
+        try:
+            query = await sync_to_async(get_records_query)(request)
+        except ValidationError as e:
+            return json_response({'error': error_message(e)}, status=400)
+
+        stream, content_type = ASYNC_EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(stream(aiter_records_rows(query)), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="records.{output}"'
+        return response